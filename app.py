@@ -1,12 +1,13 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 import os
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 import json
+import copy
 import csv
 import requests
-from datetime import datetime
-from functools import wraps
+from datetime import datetime, timedelta
+from functools import partial, wraps
 from flask_mail import Mail, Message
 from dotenv import load_dotenv
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -17,6 +18,39 @@ import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 import logging
 from logging.handlers import RotatingFileHandler
+import threading
+from types import MappingProxyType
+from collections.abc import Mapping
+import tempfile
+from contextlib import contextmanager
+import sqlite3
+import io
+import time
+import click
+import random
+import atexit
+import hashlib
+from requests.adapters import HTTPAdapter
+from urllib3 import connectionpool as urllib3_pool
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+import difflib
+import uuid
+import struct
+import bisect
+import re
+import math
+import heapq
+import mmap
+import sys
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+try:
+    import fcntl
+except ImportError:  # Windows : le verrou reste limité au processus courant
+    fcntl = None
 
 load_dotenv()
 
@@ -30,6 +64,28 @@ app.secret_key = 'votre_cle_secrete_ici_pour_les_sessions'
 def inject_current_year():
     return {"current_year": datetime.utcnow().year}
 
+
+@app.context_processor
+def inject_iata_shards():
+    manifest = iata_shards_manifest()
+    return {"iata_shards_manifest": url_for('static', filename=f'iata/{manifest}') if manifest else ''}
+
+
+@app.context_processor
+def inject_flight_options():
+    return {"flight_flex_days": flight_flex_spread(), "flight_status_max_flights": FLIGHT_STATUS_MAX_FLIGHTS}
+
+
+@app.after_request
+def cache_iata_shards(response):
+    # Fichiers nommés d'après leur contenu : ils ne changent jamais.
+    if request.path.startswith('/static/iata/') and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
 # --- CONFIGURATION POUR L'ENVOI D'EMAILS ---
 
 
@@ -52,22 +108,108 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(os.path.join(UPLOAD_FOLDER, 'destinations'), exist_ok=True)
 DATA_FILE = 'data.json'
+DATA_LOCK_FILE = os.environ.get('DATA_LOCK_FILE', DATA_FILE + '.lock')
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+SQLITE_DATA_FILE = os.environ.get('SQLITE_DATA_FILE', 'site_data.sqlite3')
 MESSAGES_FILE = 'messages.csv'
+MESSAGES_COMPACT_MIN = int(os.environ.get('MESSAGES_COMPACT_MIN', '50'))
+MESSAGES_COMPACT_RATIO = float(os.environ.get('MESSAGES_COMPACT_RATIO', '0.5'))
+MESSAGES_PAGE_SIZE = int(os.environ.get('MESSAGES_PAGE_SIZE', '20'))
+MESSAGES_MAX_PAGE_SIZE = 100
 IATA_DATA_FILE = os.path.join(os.path.dirname(__file__), 'iata_airports.json')
+IATA_BINARY_FILE = os.environ.get('IATA_BINARY_FILE', os.path.join(os.path.dirname(__file__), 'iata_airports.bin'))
+IATA_SUGGEST_LIMIT = 10
+IATA_RELOAD_INTERVAL = float(os.environ.get('IATA_RELOAD_INTERVAL', '60'))
+IATA_SUGGEST_CACHE_SIZE = int(os.environ.get('IATA_SUGGEST_CACHE_SIZE', '2048'))
+IATA_SUGGEST_MAX_AGE = int(os.environ.get('IATA_SUGGEST_MAX_AGE', '3600'))
+IATA_SHARDS_DIR = os.path.join(os.path.dirname(__file__), 'static', 'iata')
+DEFAULT_DEPARTURE_IATA = os.environ.get('DEFAULT_DEPARTURE_IATA', '').strip().upper()
+DEFAULT_DEPARTURE_LOCATION = os.environ.get('DEFAULT_DEPARTURE_LOCATION', '')
+# Groupes d'aéroports interchangeables en plus de ceux d'une même ville, ex. « ALG,ORN,CZL;TUN,NBE ».
+IATA_AIRPORT_GROUPS = os.environ.get('IATA_AIRPORT_GROUPS', 'ALG,ORN,CZL')
+EARTH_RADIUS_KM = 6371.0
 
 AIRLABS_API_KEY = os.environ.get('AIRLABS_API_KEY', '')
 AIRLABS_BASE_URL = os.environ.get('AIRLABS_BASE_URL', 'https://airlabs.co/api/v9')
 AIRLABS_ENDPOINT = os.environ.get('AIRLABS_ENDPOINT', 'flights')
 SERPAPI_KEY = os.environ.get('SERPAPI_KEY', '')
 SERPAPI_URL = os.environ.get('SERPAPI_URL', 'https://serpapi.com/search.json')
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', '0.3'))
+HTTP_RETRY_JITTER = float(os.environ.get('HTTP_RETRY_JITTER', '0.3'))
+AIRLABS_READ_TIMEOUT = float(os.environ.get('AIRLABS_READ_TIMEOUT', '12'))
+SERPAPI_READ_TIMEOUT = float(os.environ.get('SERPAPI_READ_TIMEOUT', '20'))
+BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', '5'))
+BREAKER_FAILURE_RATIO = float(os.environ.get('BREAKER_FAILURE_RATIO', '0.5'))
+BREAKER_SLOW_CALL = float(os.environ.get('BREAKER_SLOW_CALL', '10'))
+# deep_search répond normalement en 10 à 20 s : seuil de lenteur distinct.
+BREAKER_SLOW_CALL_DEEP = float(os.environ.get('BREAKER_SLOW_CALL_DEEP', '30'))
+BREAKER_SLOW_RATIO = float(os.environ.get('BREAKER_SLOW_RATIO', '0.5'))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '30'))
+FLIGHT_SEARCH_BUDGET = float(os.environ.get('FLIGHT_SEARCH_BUDGET', '30'))
+FLIGHT_WATCH_FILE = os.environ.get('FLIGHT_WATCH_FILE', 'flight_watch.json')
+FLIGHT_STATUS_FILE = os.environ.get('FLIGHT_STATUS_FILE', 'flight_status.json')
+FLIGHT_STATUS_LOCK_FILE = os.environ.get('FLIGHT_STATUS_LOCK_FILE', FLIGHT_STATUS_FILE + '.lock')
+FLIGHT_STATUS_INTERVAL = float(os.environ.get('FLIGHT_STATUS_INTERVAL', '120'))
+FLIGHT_STATUS_CALL_GAP = float(os.environ.get('FLIGHT_STATUS_CALL_GAP', '1'))
+FLIGHT_STATUS_MAX_FLIGHTS = int(os.environ.get('FLIGHT_STATUS_MAX_FLIGHTS', '5'))
+# AirLabs « flights » ne liste que les avions en vol, sans horaires ni retard.
+FLIGHT_STATUS_ENDPOINT = os.environ.get('FLIGHT_STATUS_ENDPOINT', 'schedules')
+# Numéros de vol par appel (filtre flight_iata), et pagination limit/offset d'AirLabs.
+FLIGHT_STATUS_BATCH = int(os.environ.get('FLIGHT_STATUS_BATCH', '10'))
+FLIGHT_STATUS_PAGE_SIZE = int(os.environ.get('FLIGHT_STATUS_PAGE_SIZE', '50'))
+FLIGHT_STATUS_MAX_PAGES = int(os.environ.get('FLIGHT_STATUS_MAX_PAGES', '5'))
+# Au-delà, un statut qu'AirLabs ne renvoie plus est affiché comme périmé.
+FLIGHT_STATUS_MAX_AGE = float(os.environ.get('FLIGHT_STATUS_MAX_AGE', FLIGHT_STATUS_INTERVAL * 3))
+FLIGHT_WATCH_TTL = int(os.environ.get('FLIGHT_WATCH_TTL', '21600'))
+FLIGHT_WATCH_TOUCH = int(os.environ.get('FLIGHT_WATCH_TOUCH', '600'))
+FLIGHT_WATCH_MAX = int(os.environ.get('FLIGHT_WATCH_MAX', '200'))
+FLIGHT_CACHE_BACKEND = os.environ.get('FLIGHT_CACHE_BACKEND', 'memory').lower()
+FLIGHT_CACHE_FILE = os.environ.get('FLIGHT_CACHE_FILE', 'flight_cache.sqlite3')
+FLIGHT_CACHE_SIZE = int(os.environ.get('FLIGHT_CACHE_SIZE', '500'))
+FLIGHT_CACHE_TTL = int(os.environ.get('FLIGHT_CACHE_TTL', '900'))
+FLIGHT_CACHE_STALE_TTL = int(os.environ.get('FLIGHT_CACHE_STALE_TTL', '3600'))
+FLIGHT_CACHE_KEEP = int(os.environ.get('FLIGHT_CACHE_KEEP', '86400'))
+FLIGHT_COALESCE_SHARED = os.environ.get('FLIGHT_COALESCE_SHARED', '1') == '1'
+FLIGHT_COALESCE_LOCK_DIR = os.environ.get('FLIGHT_COALESCE_LOCK_DIR', FLIGHT_CACHE_FILE + '.locks')
+FLIGHT_COALESCE_WAIT = float(os.environ.get('FLIGHT_COALESCE_WAIT', '25'))
+FLIGHT_JOB_WORKERS = int(os.environ.get('FLIGHT_JOB_WORKERS', '4'))
+FLIGHT_JOB_QUEUE = int(os.environ.get('FLIGHT_JOB_QUEUE', '20'))
+FLIGHT_JOB_KEEP = int(os.environ.get('FLIGHT_JOB_KEEP', '300'))
+FLIGHT_JOB_POLL_MS = int(os.environ.get('FLIGHT_JOB_POLL_MS', '1000'))
+FLIGHT_JOB_TIMEOUT = int(os.environ.get('FLIGHT_JOB_TIMEOUT', '60'))
+FLIGHT_JOB_SSE = os.environ.get('FLIGHT_JOB_SSE', '0') == '1'
+FLIGHT_JOB_FILE = os.environ.get('FLIGHT_JOB_FILE', 'flight_jobs.sqlite3')
+FLIGHT_FLEX_DAYS = int(os.environ.get('FLIGHT_FLEX_DAYS', '3'))
+FLIGHT_FLEX_WORKERS = int(os.environ.get('FLIGHT_FLEX_WORKERS', '7'))
+FLIGHT_FLEX_DEADLINE = float(os.environ.get('FLIGHT_FLEX_DEADLINE', '25'))
+# Appels SerpApi au plus par recherche, dates flexibles et aéroports voisins compris.
+FLIGHT_SEARCH_MAX_CALLS = int(os.environ.get('FLIGHT_SEARCH_MAX_CALLS', '12'))
+FLIGHT_MULTI_MAX_PAIRS = int(os.environ.get('FLIGHT_MULTI_MAX_PAIRS', '9'))
+FLIGHT_MULTI_WORKERS = int(os.environ.get('FLIGHT_MULTI_WORKERS', '9'))
+FLIGHT_MULTI_DEADLINE = float(os.environ.get('FLIGHT_MULTI_DEADLINE', '20'))
+FLIGHT_MULTI_MAX_RESULTS = int(os.environ.get('FLIGHT_MULTI_MAX_RESULTS', '16'))
 
-_iata_cache = None
+_iata_index = None
+_iata_stamp = None
+_iata_checked = 0.0
+_iata_shards_state = {'stamp': None, 'current': None}
+_iata_groups = {'version': None, 'groups': {}}
 
 S3_BUCKET = os.environ.get('S3_BUCKET')
 S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
 S3_PUBLIC_BASE = os.environ.get('S3_PUBLIC_BASE')
 S3_PREFIX = os.environ.get('S3_PREFIX', 'uploads/')
 S3_BACKUP_PREFIX = os.environ.get('S3_BACKUP_PREFIX', 'backups/')
+BACKUP_SNAPSHOTS = os.environ.get('BACKUP_SNAPSHOTS', '1') == '1'
+BACKUP_ASYNC = os.environ.get('BACKUP_ASYNC', '1') == '1'
+BACKUP_QUEUE_SIZE = int(os.environ.get('BACKUP_QUEUE_SIZE', '50'))
+BACKUP_MAX_ATTEMPTS = int(os.environ.get('BACKUP_MAX_ATTEMPTS', '5'))
+BACKUP_RETRY_DELAY = float(os.environ.get('BACKUP_RETRY_DELAY', '1'))
+BACKUP_FLUSH_TIMEOUT = float(os.environ.get('BACKUP_FLUSH_TIMEOUT', '10'))
 FORCE_HTTPS = os.environ.get('FORCE_HTTPS', '0') == '1'
 
 _s3_client = boto3.client('s3', region_name=S3_REGION) if S3_BUCKET else None
@@ -82,6 +224,49 @@ if not admin_logger.handlers:
     admin_logger.setLevel(logging.INFO)
     admin_logger.propagate = False
 
+# Compteurs de fonctionnement (propres à chaque worker), exposés sur /admin/metrics.
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def incr_metric(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+
+def metrics_snapshot():
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+class LRUCache:
+    # Cache borné : l'entrée la moins récemment utilisée est évincée en premier.
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
 
 def s3_enabled():
     return bool(S3_BUCKET and _s3_client)
@@ -135,23 +320,202 @@ def save_upload(file_obj, subdir):
     return rel_path
 
 
-def backup_file(local_path, key_name):
+def backup_key(key_name):
+    return f"{S3_BACKUP_PREFIX.strip('/')}/{key_name}".strip('/')
+
+
+def upload_backup(key, source, content_type):
+    # source : contenu (bytes) ou chemin d'un fichier lu au moment de l'envoi.
+    if isinstance(source, bytes):
+        payload = source
+    else:
+        with open(source, 'rb') as f:
+            payload = f.read()
+    upload_file_to_s3(io.BytesIO(payload), key, content_type)
+
+
+class BackupUploader:
+    # Envoie les sauvegardes S3 depuis un thread dédié plutôt que dans la requête.
+    # Une clé déjà en attente est remplacée par son contenu le plus récent :
+    # dix modifications rapprochées ne donnent qu'un seul envoi.
+    def __init__(self, max_pending, max_attempts, retry_delay):
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._pid = None
+
+    def _reset(self):
+        # Premier appel, ou processus forké (worker gunicorn) : l'état du parent n'est pas repris.
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._busy = False
+        self._stopping = False
+        self._thread = None
+        self._pid = os.getpid()
+
+    def submit(self, key, source, content_type=None, handler=None):
+        if self._pid != os.getpid():
+            self._reset()
+        with self._cond:
+            if key in self._pending:
+                incr_metric('backup.coalesced')
+            elif len(self._pending) >= self.max_pending:
+                return False
+            else:
+                incr_metric('backup.queued')
+            self._pending[key] = (source, content_type, handler or upload_backup, 0)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='s3-backup', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return True
+
+    def pending(self):
+        if self._pid != os.getpid():
+            return 0
+        with self._cond:
+            return len(self._pending) + (1 if self._busy else 0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                key, (source, content_type, handler, attempts) = self._pending.popitem(last=False)
+                self._busy = True
+            try:
+                handler(key, source, content_type)
+                incr_metric('backup.uploaded')
+            except (OSError, BotoCoreError, ClientError) as exc:
+                attempts += 1
+                app.logger.warning("S3 backup failed for %s (attempt %s): %s", key, attempts, exc)
+                if attempts < self.max_attempts:
+                    incr_metric('backup.retried')
+                    delay = self.retry_delay * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._stopping, timeout=delay)
+                        # Une version plus récente déjà en attente reste prioritaire.
+                        self._pending.setdefault(key, (source, content_type, handler, attempts))
+                else:
+                    incr_metric('backup.failed')
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        if self._pid != os.getpid():
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def stop(self, timeout=None):
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+backup_uploader = BackupUploader(BACKUP_QUEUE_SIZE, BACKUP_MAX_ATTEMPTS, BACKUP_RETRY_DELAY)
+atexit.register(lambda: backup_uploader.stop(BACKUP_FLUSH_TIMEOUT))
+
+
+def submit_backup(key, source, content_type=None, handler=upload_backup):
+    if BACKUP_ASYNC and backup_uploader.submit(key, source, content_type, handler):
+        return
+    # File pleine (ou mode asynchrone désactivé) : envoi direct dans la requête.
+    incr_metric('backup.inline')
+    try:
+        handler(key, source, content_type)
+    except (OSError, BotoCoreError, ClientError) as exc:
+        app.logger.warning("S3 backup failed for %s: %s", key, exc)
+
+
+def backup_bytes(payload, key_name, content_type=None):
     if not s3_enabled():
         return
-    key = f"{S3_BACKUP_PREFIX.strip('/')}/{key_name}".strip('/')
+    submit_backup(backup_key(key_name), payload, content_type)
+
+
+# Historique des versions de data.json : chaque contenu est stocké sous son empreinte
+# SHA-256 (snapshots/data/<sha256>.json) et référencé dans un petit manifest.json.
+_snapshot_state = {'digest': None}
+
+
+def snapshot_prefix():
+    return backup_key('snapshots/data')
+
+
+def read_snapshot_manifest():
     try:
-        with open(local_path, "rb") as f:
-            extra_args = {}
-            if local_path.endswith('.json'):
-                extra_args['ContentType'] = 'application/json'
-            elif local_path.endswith('.csv'):
-                extra_args['ContentType'] = 'text/csv'
-            if extra_args:
-                _s3_client.upload_fileobj(f, S3_BUCKET, key, ExtraArgs=extra_args)
+        obj = _s3_client.get_object(Bucket=S3_BUCKET, Key=f"{snapshot_prefix()}/manifest.json")
+    except ClientError as exc:
+        if exc.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return {'snapshots': []}
+        raise
+    return json.loads(obj['Body'].read())
+
+
+def read_snapshot(entry):
+    obj = _s3_client.get_object(Bucket=S3_BUCKET, Key=entry['key'])
+    return obj['Body'].read()
+
+
+def upload_snapshot(key, source, content_type):
+    payload, revision = source
+    digest = hashlib.sha256(payload).hexdigest()
+    if digest == _snapshot_state['digest']:
+        incr_metric('snapshot.unchanged')
+        return
+    with file_lock(DATA_LOCK_FILE + '.snapshots'):
+        manifest = read_snapshot_manifest()
+        entries = manifest.setdefault('snapshots', [])
+        if entries and entries[-1]['sha256'] == digest:
+            incr_metric('snapshot.unchanged')
+        else:
+            object_key = f"{snapshot_prefix()}/{digest}.json"
+            if any(entry['sha256'] == digest for entry in entries):
+                incr_metric('snapshot.reused')
             else:
-                _s3_client.upload_fileobj(f, S3_BUCKET, key)
-    except (OSError, BotoCoreError, ClientError) as exc:
-        app.logger.warning("S3 backup failed for %s: %s", local_path, exc)
+                upload_file_to_s3(io.BytesIO(payload), object_key, content_type)
+                incr_metric('snapshot.uploaded')
+            entries.append({
+                'sha256': digest,
+                'key': object_key,
+                'revision': revision,
+                'size': len(payload),
+                'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            })
+            upload_file_to_s3(io.BytesIO(serialize_data(manifest)), key, 'application/json')
+    _snapshot_state['digest'] = digest
+
+
+def backup_data_snapshot(data):
+    if not s3_enabled():
+        return
+    # La révision est exclue du contenu haché : un document identique n'est pas renvoyé.
+    content = {name: value for name, value in data.items() if name != 'revision'}
+    source = (serialize_data(content), data.get('revision'))
+    submit_backup(f"{snapshot_prefix()}/manifest.json", source, 'application/json', handler=upload_snapshot)
+
+
+def find_snapshot(manifest, ref):
+    entries = manifest.get('snapshots', [])
+    if not entries:
+        return None
+    if ref == 'latest':
+        return entries[-1]
+    if ref.isdigit():
+        matches = [entry for entry in entries if str(entry.get('revision')) == ref]
+    else:
+        matches = [entry for entry in entries if entry['sha256'].startswith(ref.lower())]
+    return matches[-1] if matches else None
 
 
 def get_client_ip():
@@ -167,39 +531,530 @@ def is_https_request():
     return request.headers.get('X-Forwarded-Proto', '').lower() == 'https'
 
 
+def iata_search_fields(airport):
+    # Code, villes (nom et alias, ex. « Alger »), nom et pays, sans accents ni majuscules.
+    cities = (airport.get('city') or '',) + tuple(airport.get('aliases') or ())
+    return (
+        fold_text(airport.get('iata')),
+        tuple(fold_text(city) for city in cities),
+        fold_text(airport.get('name')),
+        fold_text(airport.get('country')),
+    )
+
+
+def iata_search_key(fields):
+    # Champs séparés par \0 : une sous-chaîne de la clé (sans \0) est toujours une
+    # sous-chaîne de l'un des champs.
+    code, cities, name, country = fields
+    return '\0'.join((code,) + cities + (name, country))
+
+
+def iata_match_tier(fields, query):
+    # 0 : code exact, 1 : début de ville, 2 : début du nom ou du pays, 3 : sous-chaîne.
+    code, cities, name, country = fields
+    if query == code:
+        return 0
+    if any(city.startswith(query) for city in cities):
+        return 1
+    if name.startswith(query) or country.startswith(query):
+        return 2
+    return 3
+
+
+def iata_bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def iata_label(airport):
+    return f"{airport.get('iata')} - {airport.get('city')}, {airport.get('country')} ({airport.get('name')})"
+
+
+class AirportIndex:
+    # Index construit en mémoire à partir de iata_airports.json : clés normalisées
+    # calculées une seule fois, et index des bigrammes (bigramme -> rangs croissants
+    # des aéroports dont la clé le contient).
+    kind = 'json'
+
+    def __init__(self, airports, version=''):
+        self.airports = airports
+        self.version = version
+        self._fields = [iata_search_fields(airport) for airport in airports]
+        self._keys = [iata_search_key(item) for item in self._fields]
+        self._labels = [iata_label(airport) for airport in airports]
+        self._popularity = [float(airport.get('popularity') or 0) for airport in airports]
+        self._ranks = {}
+        for rank, airport in enumerate(airports):
+            self._ranks.setdefault((airport.get('iata') or '').upper(), rank)
+        self._positions = [iata_position(airport) for airport in airports]
+        self._cells = {}
+        for rank, position in enumerate(self._positions):
+            if position is not None:
+                self._cells.setdefault(iata_geo_cell(*position), []).append(rank)
+        self.grams = {}
+        for rank, key in enumerate(self._keys):
+            for gram in iata_bigrams(key):
+                if '\0' not in gram:
+                    self.grams.setdefault(gram, []).append(rank)
+
+    def __len__(self):
+        return len(self.airports)
+
+    def code(self, rank):
+        return self.airports[rank].get('iata') or ''
+
+    def rank_of(self, code):
+        return self._ranks.get(code)
+
+    def airport(self, rank):
+        return self.airports[rank]
+
+    def fields(self, rank):
+        return self._fields[rank]
+
+    def key(self, rank):
+        return self._keys[rank]
+
+    def label(self, rank):
+        return self._labels[rank]
+
+    def popularity(self, rank):
+        return self._popularity[rank]
+
+    def posting(self, gram):
+        return self.grams.get(gram, ())
+
+    def position(self, rank):
+        return self._positions[rank]
+
+    def cell(self, cell):
+        return self._cells.get(cell, ())
+
+
+# Version compilée (flask build-airports) : un seul fichier binaire projeté en mémoire
+# (mmap) et partagé par tous les workers via le cache de pages, au lieu d'une liste de
+# dictionnaires par processus. Contenu : en-tête (avec l'empreinte du JSON source),
+# enregistrements de taille fixe (code, nombre de villes, indicateurs, popularité, latitude,
+# longitude, puis position et longueur de chaque chaîne dans la table des chaînes) qui
+# redonnent les mêmes entrées que le JSON, table des bigrammes triée, listes
+# de rangs (uint32), table d'accès direct par code : 26^3 cases (AAA..ZZZ) contenant
+# rang + 1, ou 0 si le code est absent, et grille géographique : pour chaque case de
+# 1° x 1°, début de sa liste de rangs (format CSR, IATA_GEO_CELLS + 1 entrées).
+IATA_BINARY_MAGIC = b'AZIATA04'
+IATA_BINARY_HEADER = struct.Struct('<8s16sIIIIIIIII')
+IATA_CODE_SLOTS = 26 ** 3
+IATA_GEO_ROWS = 180
+IATA_GEO_COLUMNS = 360
+IATA_GEO_CELLS = IATA_GEO_ROWS * IATA_GEO_COLUMNS
+IATA_BINARY_RECORD = struct.Struct('<3sBBddd12I')
+# Indicateurs : popularité présente dans le JSON, et entière.
+IATA_POPULARITY_SET = 1
+IATA_POPULARITY_INT = 2
+IATA_BINARY_GRAM = struct.Struct('<QII')
+IATA_BINARY_STRINGS = ('city', 'name', 'country', 'aliases', 'label', 'key')
+
+
+def iata_code_slot(code):
+    if len(code) != 3 or not code.isascii() or not code.isalpha():
+        return None
+    code = code.upper()
+    return ((ord(code[0]) - 65) * 26 + ord(code[1]) - 65) * 26 + ord(code[2]) - 65
+
+
+def iata_position(airport):
+    try:
+        return float(airport['lat']), float(airport['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def iata_geo_cell(lat, lon):
+    row = min(max(int(math.floor(lat + 90)), 0), IATA_GEO_ROWS - 1)
+    return row * IATA_GEO_COLUMNS + int(math.floor(lon + 180)) % IATA_GEO_COLUMNS
+
+
+def iata_gram_code(gram):
+    return (ord(gram[0]) << 32) | ord(gram[1])
+
+
+def iata_source_digest(json_path):
+    with open(json_path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()[:16]
+
+
+def compile_iata_airports(airports, source_digest=b''):
+    index = AirportIndex(airports)
+    strings = bytearray()
+    offsets = {}
+
+    def intern(text):
+        raw = text.encode('utf-8')
+        if raw not in offsets:
+            offsets[raw] = len(strings)
+            strings.extend(raw)
+        return offsets[raw], len(raw)
+
+    records = bytearray()
+    for rank, airport in enumerate(airports):
+        values = {
+            'city': airport.get('city') or '',
+            'name': airport.get('name') or '',
+            'country': airport.get('country') or '',
+            'aliases': '\x1f'.join(airport.get('aliases') or ()),
+            'label': index.label(rank),
+            'key': index.key(rank),
+        }
+        refs = [part for name in IATA_BINARY_STRINGS for part in intern(values[name])]
+        lat, lon = index.position(rank) or (math.nan, math.nan)
+        popularity = airport.get('popularity')
+        flags = 0
+        if popularity is not None:
+            flags = IATA_POPULARITY_SET | (IATA_POPULARITY_INT if isinstance(popularity, int) else 0)
+        records += IATA_BINARY_RECORD.pack(index.code(rank).encode('ascii')[:3], len(index.fields(rank)[1]), flags,
+                                           index.popularity(rank), lat, lon, *refs)
+    grams = bytearray()
+    postings = []
+    for gram in sorted(index.grams, key=iata_gram_code):
+        ranks = index.grams[gram]
+        grams += IATA_BINARY_GRAM.pack(iata_gram_code(gram), len(postings), len(ranks))
+        postings.extend(ranks)
+    slots = [0] * IATA_CODE_SLOTS
+    for rank in range(len(airports)):
+        slot = iata_code_slot(index.code(rank))
+        if slot is not None and index.rank_of(index.code(rank).upper()) == rank:
+            slots[slot] = rank + 1
+    cell_starts = [0]
+    cell_ranks = []
+    for cell in range(IATA_GEO_CELLS):
+        cell_ranks.extend(index.cell(cell))
+        cell_starts.append(len(cell_ranks))
+    records_offset = IATA_BINARY_HEADER.size
+    strings_offset = records_offset + len(records)
+    grams_offset = strings_offset + len(strings)
+    postings_offset = grams_offset + len(grams)
+    codes_offset = postings_offset + 4 * len(postings)
+    cells_offset = codes_offset + 4 * IATA_CODE_SLOTS
+    header = IATA_BINARY_HEADER.pack(IATA_BINARY_MAGIC, source_digest, len(airports), records_offset, strings_offset,
+                                     grams_offset, len(index.grams), postings_offset, len(postings), codes_offset, cells_offset)
+    return b''.join((header, records, bytes(strings), bytes(grams), struct.pack(f'<{len(postings)}I', *postings),
+                     struct.pack(f'<{IATA_CODE_SLOTS}I', *slots), struct.pack(f'<{IATA_GEO_CELLS + 1}I', *cell_starts),
+                     struct.pack(f'<{len(cell_ranks)}I', *cell_ranks)))
+
+
+class MappedAirportIndex:
+    # Même interface que AirportIndex, lue directement dans le fichier projeté.
+    kind = 'binary'
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.source_digest, self._count, self._records, self._strings, self._grams,
+         self._gram_count, self._postings, _, self._codes, self._cells) = IATA_BINARY_HEADER.unpack_from(self._map, 0)
+        if magic != IATA_BINARY_MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} n'est pas un fichier d'aéroports compilé")
+        self.version = self.source_digest.hex()
+
+    def __len__(self):
+        return self._count
+
+    def _record(self, rank):
+        return IATA_BINARY_RECORD.unpack_from(self._map, self._records + rank * IATA_BINARY_RECORD.size)
+
+    def _string(self, record, position):
+        offset, length = record[6 + 2 * position], record[7 + 2 * position]
+        return self._map[self._strings + offset:self._strings + offset + length].decode('utf-8')
+
+    def code(self, rank):
+        offset = self._records + rank * IATA_BINARY_RECORD.size
+        return self._map[offset:offset + 3].decode('ascii')
+
+    def rank_of(self, code):
+        slot = iata_code_slot(code)
+        if slot is None:
+            return None
+        rank = struct.unpack_from('<I', self._map, self._codes + 4 * slot)[0]
+        return rank - 1 if rank else None
+
+    def airport(self, rank):
+        record = self._record(rank)
+        airport = {'iata': record[0].decode('ascii')}
+        for position, name in enumerate(IATA_BINARY_STRINGS[:3]):
+            airport[name] = self._string(record, position)
+        aliases = self._string(record, 3)
+        if aliases:
+            airport['aliases'] = aliases.split('\x1f')
+        if record[2] & IATA_POPULARITY_SET:
+            airport['popularity'] = int(record[3]) if record[2] & IATA_POPULARITY_INT else record[3]
+        if not math.isnan(record[4]):
+            airport['lat'], airport['lon'] = record[4], record[5]
+        return airport
+
+    def fields(self, rank):
+        record = self._record(rank)
+        parts = self._string(record, 5).split('\0')
+        cities = record[1]
+        return parts[0], tuple(parts[1:1 + cities]), parts[1 + cities], parts[2 + cities]
+
+    def key(self, rank):
+        return self._string(self._record(rank), 5)
+
+    def label(self, rank):
+        return self._string(self._record(rank), 4)
+
+    def popularity(self, rank):
+        return self._record(rank)[3]
+
+    def posting(self, gram):
+        # Recherche dichotomique dans la table triée des bigrammes.
+        target = iata_gram_code(gram)
+        low, high = 0, self._gram_count
+        while low < high:
+            middle = (low + high) // 2
+            code, start, count = IATA_BINARY_GRAM.unpack_from(self._map, self._grams + middle * IATA_BINARY_GRAM.size)
+            if code == target:
+                return struct.unpack_from(f'<{count}I', self._map, self._postings + start * 4)
+            if code < target:
+                low = middle + 1
+            else:
+                high = middle
+        return ()
+
+    def position(self, rank):
+        lat, lon = self._record(rank)[4:6]
+        return None if math.isnan(lat) else (lat, lon)
+
+    def cell(self, cell):
+        start, end = struct.unpack_from('<2I', self._map, self._cells + 4 * cell)
+        ranks_offset = self._cells + 4 * (IATA_GEO_CELLS + 1)
+        return struct.unpack_from(f'<{end - start}I', self._map, ranks_offset + 4 * start)
+
+
+def open_iata_index(json_path=None, binary_path=None):
+    # Fichier compilé s'il existe et correspond au JSON, sinon le JSON. L'empreinte n'est
+    # recalculée que si le JSON est plus récent que le fichier compilé.
+    json_path = json_path or IATA_DATA_FILE
+    binary_path = IATA_BINARY_FILE if binary_path is None else binary_path
+    if binary_path and os.path.exists(binary_path):
+        try:
+            index = MappedAirportIndex(binary_path)
+        except (OSError, ValueError, struct.error) as exc:
+            app.logger.warning("Airport dataset %s unusable, falling back to JSON: %s", binary_path, exc)
+        else:
+            if not os.path.exists(json_path) or os.path.getmtime(binary_path) >= os.path.getmtime(json_path):
+                return index
+            if iata_source_digest(json_path) == index.source_digest:
+                return index
+            app.logger.warning("Airport dataset %s is stale, run 'flask build-airports'; falling back to JSON", binary_path)
+    if not os.path.exists(json_path):
+        return AirportIndex([])
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    return AirportIndex(json.loads(raw), hashlib.sha256(raw).digest()[:16].hex())
+
+
+def iata_dataset_stamp():
+    stamp = []
+    for path in (IATA_DATA_FILE, IATA_BINARY_FILE):
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            stamp.append(None)
+        else:
+            stamp.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def load_iata_index():
+    # Rechargé si le JSON ou le fichier compilé a changé (vérifié au plus toutes les
+    # IATA_RELOAD_INTERVAL secondes).
+    global _iata_index, _iata_stamp, _iata_checked
+    now = time.monotonic()
+    if _iata_index is not None and now - _iata_checked < IATA_RELOAD_INTERVAL:
+        return _iata_index
+    stamp = iata_dataset_stamp()
+    if _iata_index is None or stamp != _iata_stamp:
+        _iata_index = open_iata_index()
+        _iata_stamp = stamp
+    _iata_checked = now
+    return _iata_index
+
+
 def load_iata_airports():
-    global _iata_cache
-    if _iata_cache is not None:
-        return _iata_cache
-    if not os.path.exists(IATA_DATA_FILE):
-        _iata_cache = []
-        return _iata_cache
-    with open(IATA_DATA_FILE, 'r', encoding='utf-8') as f:
-        _iata_cache = json.load(f)
-    return _iata_cache
+    index = load_iata_index()
+    return [index.airport(rank) for rank in range(len(index))]
 
 
-def suggest_airports(query):
-    query = (query or '').strip().lower()
+def suggest_airports(query, limit=IATA_SUGGEST_LIMIT):
+    query = fold_text((query or '').strip())
     if len(query) < 2:
         return []
+    index = load_iata_index()
+    # Candidats : intersection des listes des bigrammes de la requête, en partant de la
+    # plus courte ; on vérifie ensuite la sous-chaîne sur ces seuls candidats.
+    postings = sorted((index.posting(gram) for gram in iata_bigrams(query)), key=len)
+    if not postings or not postings[0]:
+        return []
+    candidates = postings[0]
+    for posting in postings[1:]:
+        members = set(posting)
+        candidates = [rank for rank in candidates if rank in members]
+        if not candidates:
+            return []
+    # Classement : type de correspondance, puis popularité, puis ordre du fichier.
+    matches = []
+    for rank in candidates:
+        key = index.key(rank)
+        if query in key:
+            matches.append((iata_match_tier(index.fields(rank), query), -index.popularity(rank), rank))
+    return [
+        {'iata': index.code(rank), 'label': index.label(rank)}
+        for _, _, rank in heapq.nsmallest(limit, matches)
+    ]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def nearest_airports(lat, lon, limit=5):
+    # Parcours de la grille par anneaux de cases autour du point. On s'arrête dès que la
+    # distance minimale possible hors des anneaux déjà vus dépasse le plus lointain des
+    # « limit » meilleurs résultats.
+    index = load_iata_index()
+    center = iata_geo_cell(lat, lon)
+    row0, column0 = divmod(center, IATA_GEO_COLUMNS)
+    best = []
+    for ring in range(max(IATA_GEO_ROWS, IATA_GEO_COLUMNS // 2) + 1):
+        cells = set()
+        for row in range(max(row0 - ring, 0), min(row0 + ring, IATA_GEO_ROWS - 1) + 1):
+            if abs(row - row0) == ring:
+                columns = range(column0 - ring, column0 + ring + 1)
+            else:
+                columns = (column0 - ring, column0 + ring)
+            cells.update(row * IATA_GEO_COLUMNS + column % IATA_GEO_COLUMNS for column in columns)
+        for cell in cells:
+            for rank in index.cell(cell):
+                distance = haversine_km(lat, lon, *index.position(rank))
+                if len(best) < limit:
+                    heapq.heappush(best, (-distance, -rank))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, -rank))
+        if len(best) == limit:
+            # Hors des anneaux vus : au moins ring degrés d'écart en latitude ou en longitude.
+            degrees = math.radians(ring)
+            widest = math.radians(min(90.0, abs(lat) + ring + 1))
+            bound = EARTH_RADIUS_KM * min(degrees, 2 * math.asin(min(1.0, math.cos(widest) * math.sin(min(degrees, math.pi) / 2))))
+            if -best[0][0] <= bound:
+                break
     results = []
-    for airport in load_iata_airports():
-        code = (airport.get('iata') or '').lower()
-        city = (airport.get('city') or '').lower()
-        name = (airport.get('name') or '').lower()
-        country = (airport.get('country') or '').lower()
-        if query in code or query in city or query in name or query in country:
-            label = f"{airport.get('iata')} - {airport.get('city')}, {airport.get('country')} ({airport.get('name')})"
-            results.append({
-                'iata': airport.get('iata'),
-                'label': label
-            })
-        if len(results) >= 10:
-            break
+    for distance, rank in sorted(best, reverse=True):
+        airport = index.airport(-rank)
+        results.append({
+            'iata': airport.get('iata'),
+            'city': airport.get('city'),
+            'label': index.label(-rank),
+            'distance_km': round(-distance, 1),
+        })
     return results
 
 
+def default_departure_iata():
+    # Départ proposé par défaut : code configuré, sinon l'aéroport le plus proche du lieu configuré.
+    if DEFAULT_DEPARTURE_IATA:
+        return DEFAULT_DEPARTURE_IATA
+    if DEFAULT_DEPARTURE_LOCATION:
+        try:
+            lat, lon = (float(part) for part in DEFAULT_DEPARTURE_LOCATION.split(','))
+        except ValueError:
+            return ''
+        nearest = nearest_airports(lat, lon, 1)
+        return nearest[0]['iata'] if nearest else ''
+    return ''
+
+
+def iata_airport_groups(index):
+    # Code -> aéroports du même groupe (même ville et même pays dans le jeu de données,
+    # ou groupe configuré), recalculé à chaque nouvelle version de l'index.
+    if _iata_groups['version'] == index.version and _iata_groups['groups']:
+        return _iata_groups['groups']
+    cities = {}
+    for rank in range(len(index)):
+        _, city_names, _, country = index.fields(rank)
+        cities.setdefault((city_names[0], country), []).append(index.code(rank))
+    groups = {}
+    for codes in cities.values():
+        for code in codes:
+            groups[code] = list(codes)
+    for group in IATA_AIRPORT_GROUPS.split(';'):
+        codes = [code.strip().upper() for code in group.split(',') if code.strip()]
+        for code in codes:
+            members = groups.setdefault(code, [code])
+            members.extend(other for other in codes if other not in members)
+    _iata_groups['version'], _iata_groups['groups'] = index.version, groups
+    return groups
+
+
+def iata_city_group(code):
+    code = (code or '').strip().upper()
+    return iata_airport_groups(load_iata_index()).get(code) or [code]
+
+
+# Fragments statiques pour l'autocomplétion côté navigateur (flask build-airport-shards) :
+# un fichier par bigramme (les deux premiers caractères de la saisie), nommé d'après son
+# empreinte, avec les aéroports dont la clé contient ce bigramme. Le navigateur filtre et
+# classe localement comme suggest_airports() ; /iata-suggest reste le recours, y compris
+# pour les bigrammes trop fréquents (fragment null dans le manifest).
+IATA_SHARD_MAX_ROWS = 2000
+
+
+def build_iata_shards(index, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    written = set()
+
+    def write_hashed(prefix, content):
+        payload = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = f"{prefix}{hashlib.sha256(payload).hexdigest()[:12]}.json"
+        if not os.path.exists(os.path.join(output_dir, name)):
+            write_file_atomic(os.path.join(output_dir, name), payload)
+        written.add(name)
+        return name
+
+    shards = {}
+    for gram in sorted(index.grams):
+        if len(index.grams[gram]) > IATA_SHARD_MAX_ROWS:
+            shards[gram] = None
+            continue
+        rows = [[rank, index.code(rank), index.label(rank), index.popularity(rank), index.key(rank), len(index.fields(rank)[1])]
+                for rank in index.grams[gram]]
+        shards[gram] = write_hashed('', rows)
+    manifest = write_hashed('manifest.', {'version': index.version, 'limit': IATA_SUGGEST_LIMIT, 'shards': shards})
+    current = {'version': index.version, 'manifest': manifest}
+    write_file_atomic(os.path.join(output_dir, 'current.json'), serialize_data(current))
+    written.add('current.json')
+    for name in os.listdir(output_dir):
+        if name not in written:
+            os.remove(os.path.join(output_dir, name))
+    return current, len(written) - 1
+
+
+def iata_shards_manifest():
+    # Nom du manifest courant, seulement s'il correspond au jeu de données chargé.
+    try:
+        stat = os.stat(os.path.join(IATA_SHARDS_DIR, 'current.json'))
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != _iata_shards_state['stamp']:
+            with open(os.path.join(IATA_SHARDS_DIR, 'current.json'), 'r', encoding='utf-8') as f:
+                _iata_shards_state.update(stamp=stamp, current=json.load(f))
+    except (OSError, ValueError):
+        return None
+    current = _iata_shards_state['current']
+    if not current or current.get('version') != load_iata_index().version:
+        return None
+    return current.get('manifest')
+
+
 def format_api_datetime(value):
     if not value:
         return ''
@@ -251,11 +1106,173 @@ def format_duration_minutes(minutes):
         return f"{hours}h"
     return f"{remainder}m"
 
-def call_airlabs(endpoint, params):
+# Connexions HTTP réutilisées (keep-alive) vers les API de vols : une session par
+# worker, un adaptateur par service pour compter séparément connexions et reprises.
+class TimedConnectionMixin:
+    upstream = 'http'
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        incr_metric(f'http.{self.upstream}.connections')
+        incr_metric(f'http.{self.upstream}.handshake_ms', round((time.perf_counter() - started) * 1000, 1))
+
+
+class UpstreamRetry(Retry):
+    def __init__(self, *args, upstream='http', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upstream = upstream
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.upstream = self.upstream
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        # urllib3 redonne le délai complet à chaque tentative : pas de reprise
+        # si elle ne peut plus finir avant l'échéance de la recherche.
+        deadline = getattr(_upstream_call, 'deadline', None)
+        if deadline is not None and time.time() + retry.get_backoff_time() + sum(_upstream_call.timeout) > deadline:
+            incr_metric(f'http.{self.upstream}.retry_skipped')
+            raise MaxRetryError(_pool, url, error)
+        incr_metric(f'http.{self.upstream}.retries')
+        return retry
+
+
+# Échéance de l'appel en cours dans ce thread, lue par UpstreamRetry.
+_upstream_call = threading.local()
+
+
+class UpstreamAdapter(HTTPAdapter):
+    def __init__(self, upstream):
+        self.upstream = upstream
+        # Pas de reprise sur délai de lecture : la requête a pu aboutir et
+        # l'attente doublerait pour le visiteur.
+        retry = UpstreamRetry(total=HTTP_RETRIES, read=0, backoff_factor=HTTP_RETRY_BACKOFF,
+                              backoff_jitter=HTTP_RETRY_JITTER, status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=frozenset({'GET'}), raise_on_status=False, upstream=upstream)
+        super().__init__(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = {}
+        for scheme, pool_cls in (('http', urllib3_pool.HTTPConnectionPool), ('https', urllib3_pool.HTTPSConnectionPool)):
+            connection_cls = type(pool_cls.ConnectionCls.__name__, (TimedConnectionMixin, pool_cls.ConnectionCls), {'upstream': self.upstream})
+            pools[scheme] = type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': connection_cls})
+        self.poolmanager.pool_classes_by_scheme = pools
+
+
+_http_session = None
+_http_session_pid = None
+_http_session_lock = threading.Lock()
+
+
+def http_session():
+    global _http_session, _http_session_pid
+    with _http_session_lock:
+        if _http_session is None or _http_session_pid != os.getpid():
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            session.mount(AIRLABS_BASE_URL, UpstreamAdapter('airlabs'))
+            session.mount(SERPAPI_URL, UpstreamAdapter('serpapi'))
+            _http_session, _http_session_pid = session, os.getpid()
+        return _http_session
+
+
+# Disjoncteur par service : sur les derniers appels, trop d'échecs (réseau, 429, 5xx)
+# ou trop d'appels lents l'ouvrent ; les appels échouent alors tout de suite pendant
+# BREAKER_COOLDOWN secondes, puis un seul appel d'essai décide de la réouverture.
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=BREAKER_WINDOW)
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == 'open' and time.time() - self._opened_at >= BREAKER_COOLDOWN:
+                self._state = 'half_open'
+            if self._state == 'closed':
+                return True
+            if self._state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+        incr_metric(f'breaker.{self.name}.rejected')
+        return False
+
+    def record(self, success, duration, slow_after=None):
+        slow_after = slow_after or BREAKER_SLOW_CALL
+        with self._lock:
+            if self._state == 'half_open':
+                self._probing = False
+                if success and duration < slow_after:
+                    self._state = 'closed'
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            self._calls.append((success, duration >= slow_after))
+            if self._state != 'closed' or len(self._calls) < BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+            slow = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= BREAKER_FAILURE_RATIO or slow >= BREAKER_SLOW_RATIO:
+                self._open()
+
+    def _open(self):
+        self._state = 'open'
+        self._opened_at = time.time()
+        incr_metric(f'breaker.{self.name}.opened')
+
+
+breakers = {'airlabs': CircuitBreaker('airlabs'), 'serpapi': CircuitBreaker('serpapi')}
+
+
+def upstream_timeout(read_timeout, deadline=None):
+    # Délais (connexion, lecture) bornés par l'échéance de la recherche ; None si elle est dépassée.
+    if deadline is None:
+        return HTTP_CONNECT_TIMEOUT, read_timeout
+    remaining = deadline - time.time()
+    if remaining <= 0.1:
+        return None
+    return min(HTTP_CONNECT_TIMEOUT, remaining), min(read_timeout, remaining)
+
+
+def upstream_get(upstream, url, params, read_timeout, deadline=None, slow_after=None):
+    # Renvoie la réponse, ou None si l'appel n'a pas été tenté ou a échoué (réseau).
+    timeout = upstream_timeout(read_timeout, deadline)
+    if timeout is None:
+        incr_metric(f'http.{upstream}.deadline_exceeded')
+        return None
+    breaker = breakers[upstream]
+    if not breaker.allow():
+        return None
+    started = time.perf_counter()
+    _upstream_call.deadline, _upstream_call.timeout = deadline, timeout
     try:
-        response = requests.get(f"{AIRLABS_BASE_URL}/{endpoint}", params=params, timeout=12)
+        response = http_session().get(url, params=params, timeout=timeout)
     except requests.RequestException as exc:
-        app.logger.warning("Flight API request failed: %s", exc)
+        breaker.record(False, time.perf_counter() - started, slow_after)
+        app.logger.warning("%s request failed: %s", upstream, exc)
+        return None
+    finally:
+        _upstream_call.deadline = None
+    breaker.record(response.status_code != 429 and response.status_code < 500, time.perf_counter() - started, slow_after)
+    return response
+
+
+def call_airlabs(endpoint, params, deadline=None):
+    response = upstream_get('airlabs', f"{AIRLABS_BASE_URL}/{endpoint}", params, AIRLABS_READ_TIMEOUT, deadline)
+    if response is None:
         return None, "Impossible de contacter l'API pour le moment."
     if response.status_code != 200:
         app.logger.warning("Flight API error status %s: %s", response.status_code, response.text[:200])
@@ -269,14 +1286,13 @@ def call_airlabs(endpoint, params):
         return None, str(payload.get('message'))
     return payload.get('response') or [], None
 
-def call_serpapi(params):
+def call_serpapi(params, deadline=None):
     params = dict(params)
     params['engine'] = 'google_flights'
     params['api_key'] = SERPAPI_KEY
-    try:
-        response = requests.get(SERPAPI_URL, params=params, timeout=20)
-    except requests.RequestException as exc:
-        app.logger.warning("SerpApi request failed: %s", exc)
+    slow_after = BREAKER_SLOW_CALL_DEEP if params.get('deep_search') else None
+    response = upstream_get('serpapi', SERPAPI_URL, params, SERPAPI_READ_TIMEOUT, deadline, slow_after)
+    if response is None:
         return None, "Impossible de contacter l'API pour le moment."
     if response.status_code != 200:
         app.logger.warning("SerpApi error status %s: %s", response.status_code, response.text[:200])
@@ -291,11 +1307,31 @@ def call_serpapi(params):
 def lookup_iata_airport(iata):
     if not iata:
         return {}
-    code = iata.strip().upper()
-    for airport in load_iata_airports():
-        if (airport.get('iata') or '').upper() == code:
-            return airport
-    return {}
+    index = load_iata_index()
+    rank = index.rank_of(iata.strip().upper())
+    return index.airport(rank) if rank is not None else {}
+
+
+def lookup_iata_airports(codes):
+    # Résolution groupée : {code: aéroport} pour chaque code connu (doublons ignorés).
+    index = load_iata_index()
+    airports = {}
+    for code in codes:
+        code = (code or '').strip().upper()
+        if code and code not in airports:
+            rank = index.rank_of(code)
+            if rank is not None:
+                airports[code] = index.airport(rank)
+    return airports
+
+
+def label_flight_airports(flights):
+    # Ajoute dep_label / arr_label (« Ville (Aéroport) ») à chaque vol, en une seule résolution.
+    airports = lookup_iata_airports(code for flight in flights for code in (flight.get('dep_iata'), flight.get('arr_iata')))
+    for flight in flights:
+        flight['dep_label'] = format_airport_label(airports.get(flight.get('dep_iata')))
+        flight['arr_label'] = format_airport_label(airports.get(flight.get('arr_iata')))
+    return flights
 
 def format_airport_label(info):
     if not info:
@@ -313,7 +1349,219 @@ def extract_time_value(item, keys):
             return format_api_datetime(value)
     return ''
 
-def fetch_flight_schedule(dep_iata, arr_iata, flight_date, return_date=None, trip_type='2', travel_class='1', passengers=1, max_price=None, direct_only=False, deep_search=False):
+# Cache des résultats de vols, par paramètres SerpApi normalisés. Frais pendant
+# FLIGHT_CACHE_TTL secondes ; ensuite, et jusqu'à FLIGHT_CACHE_STALE_TTL de plus, le
+# résultat est servi tel quel pendant qu'un thread le rafraîchit. Si l'API échoue, le
+# dernier bon résultat (conservé FLIGHT_CACHE_KEEP secondes) est renvoyé.
+class MemoryFlightCache:
+    name = 'memory'
+
+    def __init__(self, max_size):
+        self._entries = LRUCache(max_size)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, flights):
+        self._entries.put(key, (time.time(), flights))
+
+
+class SqliteFlightCache:
+    # Partagé entre les workers (même fichier, mode WAL).
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS flight_cache (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, flights TEXT NOT NULL)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute('SELECT stored_at, flights FROM flight_cache WHERE key = ?', (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put(self, key, flights):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO flight_cache (key, stored_at, flights) VALUES (?, ?, ?)',
+                     (key, now, json.dumps(flights, ensure_ascii=False)))
+        conn.execute('DELETE FROM flight_cache WHERE stored_at < ?', (now - FLIGHT_CACHE_KEEP,))
+
+
+def create_flight_cache(backend):
+    if backend == 'sqlite':
+        return SqliteFlightCache(FLIGHT_CACHE_FILE)
+    if backend != 'memory':
+        raise ValueError(f"FLIGHT_CACHE_BACKEND inconnu : {backend}")
+    return MemoryFlightCache(FLIGHT_CACHE_SIZE)
+
+
+flight_cache = create_flight_cache(FLIGHT_CACHE_BACKEND)
+_flight_refreshing = set()
+_flight_refreshing_lock = threading.Lock()
+
+
+def flight_cache_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def read_flight_cache(key):
+    try:
+        return flight_cache.get(key)
+    except sqlite3.Error as exc:
+        app.logger.warning("Flight cache read failed: %s", exc)
+        return None
+
+
+def store_flights(key, flights):
+    try:
+        flight_cache.put(key, flights)
+    except sqlite3.Error as exc:
+        app.logger.warning("Flight cache write failed: %s", exc)
+
+
+class SingleFlight:
+    # Appels identiques simultanés : le premier exécute la fonction, les suivants
+    # attendent son résultat au lieu de refaire l'appel.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, deadline=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            # L'attente reste bornée par l'échéance de celui qui attend.
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            if not call['done'].wait(timeout):
+                raise TimeoutError(key)
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        try:
+            call['result'] = func()
+        except Exception as exc:
+            call['error'] = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+
+_serpapi_calls = SingleFlight()
+
+
+def search_serpapi(key, params, deadline=None):
+    # Renvoie (vols, erreur) et met le résultat en cache ; vols vaut None si l'API a échoué.
+    payload, error = call_serpapi(params, deadline)
+    if payload is None:
+        return None, error
+    flights, error = parse_flight_results(payload, params['type'])
+    store_flights(key, flights)
+    return flights, error
+
+
+@contextmanager
+def search_lock(key, deadline=None):
+    # Verrou de fichier propre à une recherche, attendu au plus jusqu'à l'échéance ;
+    # renvoie False si elle est atteinte. Le fichier est supprimé par son détenteur :
+    # après avoir obtenu le verrou, on vérifie qu'il s'agit toujours du fichier en place.
+    if not fcntl:
+        yield True
+        return
+    os.makedirs(FLIGHT_COALESCE_LOCK_DIR, exist_ok=True)
+    path = os.path.join(FLIGHT_COALESCE_LOCK_DIR, f'{key}.lock')
+    limit = time.time() + FLIGHT_COALESCE_WAIT if deadline is None else min(deadline, time.time() + FLIGHT_COALESCE_WAIT)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            if time.time() >= limit:
+                yield False
+                return
+            time.sleep(0.05)
+            continue
+        try:
+            current = os.stat(path).st_ino == os.fstat(fd).st_ino
+        except OSError:
+            current = False
+        if current:
+            break
+        os.close(fd)
+    try:
+        yield True
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        os.close(fd)
+
+
+def search_serpapi_shared(key, params, deadline=None):
+    # Cache SQLite partagé : un verrou par recherche fait aussi attendre les autres
+    # workers, qui relisent ensuite le cache au lieu d'appeler l'API.
+    if not FLIGHT_COALESCE_SHARED or flight_cache.name != 'sqlite':
+        return search_serpapi(key, params, deadline)
+    with search_lock(key, deadline) as locked:
+        if not locked:
+            incr_metric('flight_calls.lock_timeout')
+        cached = read_flight_cache(key)
+        if cached and time.time() - cached[0] < FLIGHT_CACHE_TTL:
+            incr_metric('flight_calls.coalesced_workers')
+            return cached[1], None
+        return search_serpapi(key, params, deadline)
+
+
+def coalesced_search(key, params, deadline=None):
+    try:
+        (flights, error), shared = _serpapi_calls.do(key, lambda: search_serpapi_shared(key, params, deadline), deadline)
+    except TimeoutError:
+        incr_metric('flight_calls.wait_timeout')
+        return None, "Impossible de contacter l'API pour le moment."
+    if shared:
+        incr_metric('flight_calls.coalesced')
+    return flights, error
+
+
+def _refresh_flights(key, params):
+    try:
+        flights, _ = coalesced_search(key, params, time.time() + FLIGHT_SEARCH_BUDGET)
+        if flights is None:
+            incr_metric('flight_cache.refresh_failed')
+    finally:
+        with _flight_refreshing_lock:
+            _flight_refreshing.discard(key)
+
+
+def refresh_flights_in_background(key, params):
+    # Un seul rafraîchissement à la fois par recherche.
+    with _flight_refreshing_lock:
+        if key in _flight_refreshing:
+            return
+        _flight_refreshing.add(key)
+    incr_metric('flight_cache.refresh')
+    threading.Thread(target=_refresh_flights, args=(key, params), name='flight-refresh', daemon=True).start()
+
+
+def fetch_flight_schedule(dep_iata, arr_iata, flight_date, return_date=None, trip_type='2', travel_class='1', passengers=1, max_price=None, direct_only=False, deep_search=False, deadline=None):
     if not SERPAPI_KEY:
         return [], "La cle API n'est pas configuree."
     params = {
@@ -333,10 +1581,37 @@ def fetch_flight_schedule(dep_iata, arr_iata, flight_date, return_date=None, tri
     if deep_search:
         params['deep_search'] = 'true'
 
-    payload, error = call_serpapi(params)
-    if payload is None:
+    key = flight_cache_key(params)
+    cached = read_flight_cache(key)
+    age = time.time() - cached[0] if cached else None
+    if cached and age < FLIGHT_CACHE_TTL:
+        incr_metric('flight_cache.hit')
+        return cached_flight_results(cached[1])
+    if cached and age < FLIGHT_CACHE_TTL + FLIGHT_CACHE_STALE_TTL:
+        incr_metric('flight_cache.stale')
+        refresh_flights_in_background(key, params)
+        return cached_flight_results(cached[1])
+    incr_metric('flight_cache.miss')
+
+    flights, error = coalesced_search(key, params, deadline)
+    if flights is None:
+        if cached and age < FLIGHT_CACHE_KEEP:
+            # API indisponible : dernier bon résultat connu.
+            incr_metric('flight_cache.fallback')
+            return cached_flight_results(cached[1])
+        return [], error
+    if error:
         return [], error
+    return cached_flight_results(flights)
+
 
+def cached_flight_results(flights):
+    if not flights:
+        return [], "Aucun vol trouve pour ces criteres."
+    return label_flight_airports([dict(flight) for flight in flights]), None
+
+
+def parse_flight_results(payload, trip_type):
     items = (payload.get('best_flights') or []) + (payload.get('other_flights') or [])
     if not items:
         return [], "Aucun vol trouve pour ces criteres."
@@ -365,69 +1640,292 @@ def fetch_flight_schedule(dep_iata, arr_iata, flight_date, return_date=None, tri
             'price': item.get('price'),
             'currency': currency,
             'duration': format_duration_minutes(item.get('total_duration')),
+            'duration_minutes': item.get('total_duration'),
             'trip_type': trip_type
         })
     if not flights:
         return [], "Aucun vol trouve pour ces criteres."
     return flights, None
 
+
+# Statut des vols suivis : les numéros demandés par les visiteurs forment une liste
+# commune (FLIGHT_WATCH_FILE). Un seul worker, détenteur du verrou, interroge AirLabs
+# (un appel par lot de numéros) et écrit FLIGHT_STATUS_FILE ; les pages ne lisent que ce fichier.
+FLIGHT_NUMBER_RE = re.compile(r'^([A-Z0-9]{2})(\d{1,4}[A-Z]?)$')
+FLIGHT_STATUS_CLASSES = {'scheduled', 'active', 'landed', 'cancelled', 'incident', 'diverted'}
+FLIGHT_STATUS_ALIASES = {'en-route': 'active', 'en route': 'active', 'started': 'active'}
+_shared_json = {}
+_status_poller = {'pid': None}
+_status_poller_lock = threading.Lock()
+
+
+def parse_flight_numbers(value):
+    numbers = []
+    # « AH 1020 » : recolle le code compagnie et le numéro avant de découper.
+    value = re.sub(r'\b([A-Z0-9]{2})\s+(\d{1,4}[A-Z]?)\b', r'\1\2', (value or '').upper())
+    for part in re.split(r'[\s,;]+', value):
+        if FLIGHT_NUMBER_RE.match(part) and part not in numbers:
+            numbers.append(part)
+    return numbers[:FLIGHT_STATUS_MAX_FLIGHTS]
+
+
+def read_shared_json(path):
+    # Relu seulement quand le fichier change (date de modification et taille).
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _shared_json.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    _shared_json[path] = (stamp, value)
+    return value
+
+
+def watch_flights(numbers):
+    # N'écrit la liste que si un vol est nouveau ou n'a pas été redemandé depuis FLIGHT_WATCH_TOUCH.
+    now = time.time()
+    watched = read_shared_json(FLIGHT_WATCH_FILE)
+    if any(now - watched.get(number, 0) >= FLIGHT_WATCH_TOUCH for number in numbers):
+        with file_lock(FLIGHT_WATCH_FILE + '.lock'):
+            watched = {number: seen for number, seen in read_shared_json(FLIGHT_WATCH_FILE).items() if now - seen < FLIGHT_WATCH_TTL}
+            for number in numbers:
+                if number in watched or len(watched) < FLIGHT_WATCH_MAX:
+                    watched[number] = now
+            write_file_atomic(FLIGHT_WATCH_FILE, json.dumps(watched).encode('utf-8'))
+    ensure_status_poller()
+
+
+def flight_status_entry(item, now):
+    status = (item.get('status') or 'unknown').lower()
+    status = FLIGHT_STATUS_ALIASES.get(status, status)
+    return {
+        'flight_number': (item.get('flight_iata') or '').upper(),
+        'airline': item.get('airline_iata') or '',
+        'dep_iata': (item.get('dep_iata') or '-').upper(),
+        'arr_iata': (item.get('arr_iata') or '-').upper(),
+        'dep_time': extract_time_value(item, ('dep_actual', 'dep_estimated', 'dep_time')),
+        'arr_time': extract_time_value(item, ('arr_actual', 'arr_estimated', 'arr_time')),
+        'delayed': item.get('delayed') or item.get('dep_delayed'),
+        'status': status,
+        'status_class': status if status in FLIGHT_STATUS_CLASSES else 'unknown',
+        'updated': now,
+    }
+
+
+def airlabs_pages(endpoint, params):
+    # Suit la pagination limit/offset ; renvoie les lignes (None si le premier appel
+    # échoue) et le nombre d'appels faits.
+    rows = []
+    for page in range(FLIGHT_STATUS_MAX_PAGES):
+        if page:
+            time.sleep(FLIGHT_STATUS_CALL_GAP)
+        incr_metric('flight_status.calls')
+        items, error = call_airlabs(endpoint, dict(params, limit=FLIGHT_STATUS_PAGE_SIZE, offset=len(rows)))
+        if items is None:
+            app.logger.warning("Flight status poll failed for %s: %s", params.get('flight_iata'), error)
+            return (rows if page else None), page + 1
+        rows.extend(items)
+        if len(items) < FLIGHT_STATUS_PAGE_SIZE:
+            break
+    return rows, page + 1
+
+
+def poll_flight_statuses():
+    if not AIRLABS_API_KEY:
+        return 0
+    now = time.time()
+    numbers = sorted(number for number, seen in read_shared_json(FLIGHT_WATCH_FILE).items()
+                     if FLIGHT_NUMBER_RE.match(number) and now - seen < FLIGHT_WATCH_TTL)
+    if not numbers:
+        return 0
+    previous = read_shared_json(FLIGHT_STATUS_FILE).get('flights', {})
+    statuses = {number: previous[number] for number in numbers if number in previous}
+    calls = 0
+    for start in range(0, len(numbers), FLIGHT_STATUS_BATCH):
+        if calls:
+            time.sleep(FLIGHT_STATUS_CALL_GAP)
+        batch = numbers[start:start + FLIGHT_STATUS_BATCH]
+        items, count = airlabs_pages(FLIGHT_STATUS_ENDPOINT, {'api_key': AIRLABS_API_KEY, 'flight_iata': ','.join(batch)})
+        calls += count
+        for item in items or ():
+            number = (item.get('flight_iata') or '').upper()
+            if number in batch:
+                statuses[number] = flight_status_entry(item, now)
+    write_file_atomic(FLIGHT_STATUS_FILE, json.dumps({'updated': now, 'flights': statuses}, ensure_ascii=False).encode('utf-8'))
+    return calls
+
+
+def try_status_leadership(lock_file):
+    if not fcntl:
+        return True
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def flight_status_loop():
+    # Le verrou reste pris tant que le worker vit ; s'il s'arrête, un autre le reprend.
+    lock_file = open(FLIGHT_STATUS_LOCK_FILE, 'a')
+    leader = False
+    while True:
+        if not leader:
+            leader = try_status_leadership(lock_file)
+        if leader:
+            try:
+                poll_flight_statuses()
+            except Exception:
+                app.logger.exception("Flight status poll failed")
+        time.sleep(FLIGHT_STATUS_INTERVAL)
+
+
+def ensure_status_poller():
+    with _status_poller_lock:
+        if _status_poller['pid'] == os.getpid():
+            return
+        _status_poller['pid'] = os.getpid()
+    threading.Thread(target=flight_status_loop, name='flight-status', daemon=True).start()
+
+
+def flight_statuses(numbers):
+    cached = read_shared_json(FLIGHT_STATUS_FILE)
+    known = cached.get('flights', {})
+    now = time.time()
+    statuses = []
+    for number in numbers:
+        entry = dict(known[number]) if number in known else {'flight_number': number, 'status': 'unknown', 'status_class': 'unknown', 'pending': True}
+        if not entry.get('pending') and now - entry.get('updated', 0) >= FLIGHT_STATUS_MAX_AGE:
+            entry.update(status='unknown', status_class='unknown', delayed=None, stale=True)
+        statuses.append(entry)
+    label_flight_airports([entry for entry in statuses if not entry.get('pending')])
+    return statuses, cached.get('updated')
+
+
 # --- FONCTIONS DE GESTION DES DONNÉES ---
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        initial_data = {
-            'company_name': 'TRACHE TRAVEL & SERVICES',
-            'tagline': 'Votre partenaire pour des voyages inoubliables.',
-            'logo': 'uploads/logo.jpg',
-            'services': [
-                {'nom': 'Réservation de Vols', 'description': 'Billets d\'avion au meilleur prix pour toutes les destinations mondiales.', 'icon': 'fa-plane-departure'},
-                {'nom': 'Hôtels de Prestige', 'description': 'Sélection d\'hôtels de luxe et économiques dans le monde entier.', 'icon': 'fa-hotel'},
-                {'nom': 'Circuits Sur Mesure', 'description': 'Voyages organisés et circuits personnalisés selon vos envies.', 'icon': 'fa-map-signs'},
-                {'nom': 'Location de Voitures', 'description': 'Véhicules de location modernes pour tous vos déplacements.', 'icon': 'fa-car'},
-                {'nom': 'Visa & Documentation', 'description': 'Assistance complète pour vos formalités administratives de voyage.', 'icon': 'fa-file-alt'},
-                {'nom': 'Assurance Voyage', 'description': 'Protection complète pour voyager en toute sérénité et sécurité.', 'icon': 'fa-shield-alt'}
-            ],
-            'destinations': [
-                {'nom': 'Paris, France', 'description': 'La ville lumière et ses monuments emblématiques.', 'prix': '€599', 'image': 'uploads/destinations/paris.png'},
-                {'nom': 'Dubaï, EAU', 'description': 'Luxe et modernité au cœur du désert.', 'prix': '€899', 'image': 'uploads/destinations/dubai.png'},
-                {'nom': 'Tokyo, Japon', 'description': 'Tradition et technologie dans la capitale nippone.', 'prix': '€1299', 'image': 'https://images.unsplash.com/photo-1542051841857-5f90071e7989?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'New York, USA', 'description': 'La ville qui ne dort jamais et ses gratte-ciels.', 'prix': '€799', 'image': 'https://images.unsplash.com/photo-1496442226666-8d4d0e62e6e9?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Santorin, Grèce', 'description': 'Couchers de soleil magiques et villages blancs.', 'prix': '€750', 'image': 'uploads/destinations/santorini.jpg'},
-                {'nom': 'Bali, Indonésie', 'description': 'L\'île des dieux, entre plages et rizières verdoyantes.', 'prix': '€1100', 'image': 'https://images.unsplash.com/photo-1537996194471-e657df975ab4?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Rome, Italie', 'description': 'Un voyage à travers l\'histoire antique et la dolce vita.', 'prix': '€450', 'image': 'https://images.unsplash.com/photo-1552832230-c0197dd311b5?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Kyoto, Japon', 'description': 'L\'ancienne capitale impériale, ses temples et ses jardins zen.', 'prix': '€1350', 'image': 'https://images.unsplash.com/photo-1524413840807-0c3cb6fa808d?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Rio de Janeiro, Brésil', 'description': 'Entre plages iconiques, samba et paysages à couper le souffle.', 'prix': '€950', 'image': 'https://images.unsplash.com/photo-1483729558449-99ef09a8c325?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Le Caire, Égypte', 'description': 'Aux portes des pyramides, un plongeon dans l\'histoire des pharaons.', 'prix': '€680', 'image': 'uploads/destinations/caire.jpg'},
-                {'nom': 'Istanbul, Turquie', 'description': 'Un pont entre l\'Europe et l\'Asie, riche d\'histoire et de saveurs.', 'prix': '€480', 'image': 'https://images.unsplash.com/photo-1527838832700-5059252407fa?auto=format&fit=crop&w=800&q=60'},
-                {'nom': 'Sharm El Sheikh, Égypte', 'description': 'Plongée de classe mondiale dans les eaux cristallines de la mer Rouge.', 'prix': '€550', 'image': 'uploads/destinations/SharmElSheikh.jpg'},
-                {'nom': 'Guangzhou, Chine', 'description': 'Mégapole moderne et dynamique, cœur du commerce et de la gastronomie cantonaise.', 'prix': '€850', 'image': 'uploads/destinations/guangzhou.jpg'},
-                {'nom': 'Toronto, Canada', 'description': 'La métropole cosmopolite du Canada, avec sa skyline iconique et sa scène culturelle vibrante.', 'prix': '€720', 'image': 'uploads/destinations/toronto.jpg'}
-            ],
-            'contact_info': {
-                'telephone': '+213 662 90 10 49 / +213 540 62 24 64',
-                'email': 'trachetravelservice@gmail.com',
-                'adresse': 'n°8 Rue Adda Ouled Derrer, Lot n°3 Hai Makkari, Oran, Algeria',
-                'horaires': 'Dim-Jeu: 9h-18h, Sam: 9h-13h',
-                'social_links': {
-                    'facebook': 'https://www.facebook.com/trachetravel/',
-                    'instagram': 'https://www.instagram.com/trache_travel_services/',
-                    'tiktok': 'https://www.tiktok.com/@trachetravel.services'
-                }
-            },
-            'why_us': [
-                {'title': 'Meilleurs Prix Garantis', 'description': 'Nous négocions les meilleurs tarifs pour vous.', 'icon': 'fa-tags'},
-                {'title': 'Support Client 24/7', 'description': 'Notre équipe est disponible à tout moment.', 'icon': 'fa-headset'},
-                {'title': 'Destinations Mondiales', 'description': 'Explorez le monde avec nos offres exclusives.', 'icon': 'fa-globe-americas'}
-            ],
-            'assurance_individuel': [],
-            'assurance_famille': [],
-            'visa_rows': [],
-            'assurance_tables_html': '',
-            'visa_tables_html': ''
-        }
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(initial_data, f, indent=4, ensure_ascii=False)
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+# Verrou inter-processus (flock) réentrant pour le thread qui le détient déjà.
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+_file_lock_state = threading.local()
+
+
+@contextmanager
+def file_lock(lock_path):
+    with _file_locks_guard:
+        thread_lock = _file_locks.setdefault(lock_path, threading.RLock())
+    with thread_lock:
+        held = getattr(_file_lock_state, 'held', None)
+        if held is None:
+            held = _file_lock_state.held = set()
+        if lock_path in held:
+            yield
+            return
+        with open(lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            held.add(lock_path)
+            try:
+                yield
+            finally:
+                held.discard(lock_path)
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_file_atomic(path, payload):
+    # Écrit dans un fichier temporaire du même dossier puis le substitue : un lecteur
+    # voit toujours l'ancien ou le nouveau contenu complet, jamais un fichier tronqué.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+LIST_SECTIONS = {
+    'services': ['nom', 'description', 'icon'],
+    'destinations': ['nom', 'description', 'prix', 'image'],
+    'why_us': ['title', 'description', 'icon'],
+    'visa_rows': ['category', 'destination', 'visa_type', 'duree', 'delai', 'tarif', 'tarif_total', 'docs'],
+    'assurance_individuel': ['duree', 'enfant', 'adulte', '60_64', '65_69', '70_74', '75_79', '80_85'],
+    'assurance_famille': ['duree', 'p2', 'p3', 'p4', 'p5', 'p6'],
+}
+# Sections volumineuses utilisées seulement par les pages visa / assurance (et l'admin).
+HEAVY_SECTIONS = ('visa_tables_html', 'assurance_tables_html')
+
+
+def initial_site_data():
+    return {
+        'company_name': 'TRACHE TRAVEL & SERVICES',
+        'tagline': 'Votre partenaire pour des voyages inoubliables.',
+        'logo': 'uploads/logo.jpg',
+        'services': [
+            {'nom': 'Réservation de Vols', 'description': 'Billets d\'avion au meilleur prix pour toutes les destinations mondiales.', 'icon': 'fa-plane-departure'},
+            {'nom': 'Hôtels de Prestige', 'description': 'Sélection d\'hôtels de luxe et économiques dans le monde entier.', 'icon': 'fa-hotel'},
+            {'nom': 'Circuits Sur Mesure', 'description': 'Voyages organisés et circuits personnalisés selon vos envies.', 'icon': 'fa-map-signs'},
+            {'nom': 'Location de Voitures', 'description': 'Véhicules de location modernes pour tous vos déplacements.', 'icon': 'fa-car'},
+            {'nom': 'Visa & Documentation', 'description': 'Assistance complète pour vos formalités administratives de voyage.', 'icon': 'fa-file-alt'},
+            {'nom': 'Assurance Voyage', 'description': 'Protection complète pour voyager en toute sérénité et sécurité.', 'icon': 'fa-shield-alt'}
+        ],
+        'destinations': [
+            {'nom': 'Paris, France', 'description': 'La ville lumière et ses monuments emblématiques.', 'prix': '€599', 'image': 'uploads/destinations/paris.png'},
+            {'nom': 'Dubaï, EAU', 'description': 'Luxe et modernité au cœur du désert.', 'prix': '€899', 'image': 'uploads/destinations/dubai.png'},
+            {'nom': 'Tokyo, Japon', 'description': 'Tradition et technologie dans la capitale nippone.', 'prix': '€1299', 'image': 'https://images.unsplash.com/photo-1542051841857-5f90071e7989?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'New York, USA', 'description': 'La ville qui ne dort jamais et ses gratte-ciels.', 'prix': '€799', 'image': 'https://images.unsplash.com/photo-1496442226666-8d4d0e62e6e9?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Santorin, Grèce', 'description': 'Couchers de soleil magiques et villages blancs.', 'prix': '€750', 'image': 'uploads/destinations/santorini.jpg'},
+            {'nom': 'Bali, Indonésie', 'description': 'L\'île des dieux, entre plages et rizières verdoyantes.', 'prix': '€1100', 'image': 'https://images.unsplash.com/photo-1537996194471-e657df975ab4?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Rome, Italie', 'description': 'Un voyage à travers l\'histoire antique et la dolce vita.', 'prix': '€450', 'image': 'https://images.unsplash.com/photo-1552832230-c0197dd311b5?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Kyoto, Japon', 'description': 'L\'ancienne capitale impériale, ses temples et ses jardins zen.', 'prix': '€1350', 'image': 'https://images.unsplash.com/photo-1524413840807-0c3cb6fa808d?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Rio de Janeiro, Brésil', 'description': 'Entre plages iconiques, samba et paysages à couper le souffle.', 'prix': '€950', 'image': 'https://images.unsplash.com/photo-1483729558449-99ef09a8c325?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Le Caire, Égypte', 'description': 'Aux portes des pyramides, un plongeon dans l\'histoire des pharaons.', 'prix': '€680', 'image': 'uploads/destinations/caire.jpg'},
+            {'nom': 'Istanbul, Turquie', 'description': 'Un pont entre l\'Europe et l\'Asie, riche d\'histoire et de saveurs.', 'prix': '€480', 'image': 'https://images.unsplash.com/photo-1527838832700-5059252407fa?auto=format&fit=crop&w=800&q=60'},
+            {'nom': 'Sharm El Sheikh, Égypte', 'description': 'Plongée de classe mondiale dans les eaux cristallines de la mer Rouge.', 'prix': '€550', 'image': 'uploads/destinations/SharmElSheikh.jpg'},
+            {'nom': 'Guangzhou, Chine', 'description': 'Mégapole moderne et dynamique, cœur du commerce et de la gastronomie cantonaise.', 'prix': '€850', 'image': 'uploads/destinations/guangzhou.jpg'},
+            {'nom': 'Toronto, Canada', 'description': 'La métropole cosmopolite du Canada, avec sa skyline iconique et sa scène culturelle vibrante.', 'prix': '€720', 'image': 'uploads/destinations/toronto.jpg'}
+        ],
+        'contact_info': {
+            'telephone': '+213 662 90 10 49 / +213 540 62 24 64',
+            'email': 'trachetravelservice@gmail.com',
+            'adresse': 'n°8 Rue Adda Ouled Derrer, Lot n°3 Hai Makkari, Oran, Algeria',
+            'horaires': 'Dim-Jeu: 9h-18h, Sam: 9h-13h',
+            'social_links': {
+                'facebook': 'https://www.facebook.com/trachetravel/',
+                'instagram': 'https://www.instagram.com/trache_travel_services/',
+                'tiktok': 'https://www.tiktok.com/@trachetravel.services'
+            }
+        },
+        'why_us': [
+            {'title': 'Meilleurs Prix Garantis', 'description': 'Nous négocions les meilleurs tarifs pour vous.', 'icon': 'fa-tags'},
+            {'title': 'Support Client 24/7', 'description': 'Notre équipe est disponible à tout moment.', 'icon': 'fa-headset'},
+            {'title': 'Destinations Mondiales', 'description': 'Explorez le monde avec nos offres exclusives.', 'icon': 'fa-globe-americas'}
+        ],
+        'assurance_individuel': [],
+        'assurance_famille': [],
+        'visa_rows': [],
+        'assurance_tables_html': '',
+        'visa_tables_html': ''
+    }
+
+
+def apply_data_defaults(data):
+    data.setdefault('revision', 0)
     data.setdefault('tagline', 'Votre partenaire pour des voyages inoubliables.')
     data.setdefault('assurance_tables_html', '')
     data.setdefault('visa_tables_html', '')
@@ -465,42 +1963,1015 @@ def load_data():
             if new_img != img:
                 dest['image'] = new_img
                 dirty = True
-    if dirty:
-        save_data(data)
+    return dirty
+
+
+def serialize_data(data):
+    return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+
+
+class JsonDataStore:
+    # Stockage historique : tout le document dans un fichier JSON, réécrit à chaque modification.
+    # Copie découpée à côté (path + '.sections') : un fichier pour les sections légères et un
+    # par section lourde, chacun marqué de la signature du JSON dont il provient ; une copie
+    # périmée (JSON restauré ou modifié à la main) est refaite à la lecture suivante.
+    name = 'json'
+
+    def __init__(self, path, lock_path):
+        self.path = path
+        self.lock_path = lock_path
+        self.parts_dir = path + '.sections'
+
+    def lock(self):
+        return file_lock(self.lock_path)
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def revision(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('revision', 0)
+        except (OSError, ValueError):
+            return 0
+
+    def read(self):
+        if not os.path.exists(self.path):
+            with self.lock():
+                if not os.path.exists(self.path):
+                    write_file_atomic(self.path, serialize_data(initial_site_data()))
+        signature = self.signature()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if apply_data_defaults(data):
+            signature = self.write(data)
+        return data, signature
+
+    def read_sections(self, names):
+        # Les sections légères viennent ensemble ; une section lourde n'est lue que si elle est demandée.
+        signature = self.signature()
+        sections = {}
+        parts = [name for name in HEAVY_SECTIONS if name in names]
+        if any(name not in HEAVY_SECTIONS for name in names):
+            parts.insert(0, 'light')
+        for part in parts:
+            payload = self._read_part(part, signature)
+            if payload is None:
+                data, signature = self._split()
+                return {name: value for name, value in data.items() if name in names or name not in HEAVY_SECTIONS}, signature
+            sections.update(payload['sections'])
+        return sections, signature
+
+    def section_names(self):
+        payload = self._read_part('light', self.signature())
+        return payload['names'] if payload is not None else list(self._split()[0])
+
+    def _part_path(self, part):
+        return os.path.join(self.parts_dir, part + '.json')
+
+    def _read_part(self, part, signature):
+        if signature is None:
+            return None
+        try:
+            with open(self._part_path(part), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return payload if payload.get('source') == list(signature) else None
+
+    def _split(self):
+        with self.lock():
+            data, signature = self.read()
+            self._write_parts(data, signature)
+        return data, signature
+
+    def _write_parts(self, data, signature):
+        parts = {name: {name: data[name]} if name in data else {} for name in HEAVY_SECTIONS}
+        parts['light'] = {name: value for name, value in data.items() if name not in HEAVY_SECTIONS}
+        try:
+            os.makedirs(self.parts_dir, exist_ok=True)
+            for part, sections in parts.items():
+                payload = {'source': list(signature), 'sections': sections}
+                if part == 'light':
+                    payload['names'] = list(data)
+                write_file_atomic(self._part_path(part), json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        except OSError as exc:
+            app.logger.warning("Could not write %s: %s", self.parts_dir, exc)
+
+    def write(self, data):
+        with self.lock():
+            # Révision strictement croissante, même si la copie modifiée était périmée.
+            disk_revision = self.revision()
+            if data.get('revision', 0) < disk_revision:
+                app.logger.warning("save_data: revision %s older than disk revision %s", data.get('revision', 0), disk_revision)
+            data['revision'] = max(data.get('revision', 0), disk_revision) + 1
+            write_file_atomic(self.path, serialize_data(data))
+            signature = self.signature()
+            self._write_parts(data, signature)
+            return signature
+
+    def _rewrite(self, mutate):
+        with self.lock():
+            data, _ = self.read()
+            if not mutate(data):
+                return False
+            self.write(data)
+            return True
+
+    def modify_item(self, section, index, update):
+        def mutate(data):
+            rows = data.setdefault(section, [])
+            if not 0 <= index < len(rows):
+                return False
+            update(rows[index])
+            return True
+        return self._rewrite(mutate)
+
+    def append_item(self, section, item):
+        def mutate(data):
+            data.setdefault(section, []).append(item)
+            return True
+        return self._rewrite(mutate)
+
+    def delete_item(self, section, index):
+        def mutate(data):
+            rows = data.setdefault(section, [])
+            if not 0 <= index < len(rows):
+                return False
+            rows.pop(index)
+            return True
+        return self._rewrite(mutate)
+
+    def swap_items(self, section, index, other):
+        def mutate(data):
+            rows = data.setdefault(section, [])
+            if not (0 <= index < len(rows) and 0 <= other < len(rows)):
+                return False
+            rows[index], rows[other] = rows[other], rows[index]
+            return True
+        return self._rewrite(mutate)
+
+    def modify_fields(self, update):
+        def mutate(data):
+            update(data)
+            return True
+        return self._rewrite(mutate)
+
+
+class SqliteDataStore:
+    # Une table par section : une modification ne touche qu'une ligne, dans une transaction.
+    name = 'sqlite'
+
+    def __init__(self, path, lock_path, synchronous='NORMAL'):
+        self.path = path
+        self.lock_path = lock_path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def lock(self):
+        return file_lock(self.lock_path)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS contact_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        for section, fields in LIST_SECTIONS.items():
+            columns = ', '.join(f'"{field}" TEXT' for field in fields)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {section} (id INTEGER PRIMARY KEY, position INTEGER NOT NULL, {columns}, extra TEXT)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self, write=True):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _revision(self, conn):
+        row = conn.execute("SELECT value FROM settings WHERE key = 'revision'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _bump_revision(self, conn, minimum=0):
+        revision = max(self._revision(conn) or 0, minimum) + 1
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('revision', ?)", (json.dumps(revision),))
+        return revision
+
+    def signature(self):
+        return self._revision(self._connect())
+
+    def revision(self):
+        return self.signature() or 0
+
+    def _item_to_row(self, section, item):
+        fields = LIST_SECTIONS[section]
+        extra = {key: value for key, value in item.items() if key not in fields}
+        return [item.get(field) for field in fields] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+    def _row_to_item(self, section, row):
+        fields = LIST_SECTIONS[section]
+        item = {field: value for field, value in zip(fields, row) if value is not None}
+        if row[len(fields)]:
+            item.update(json.loads(row[len(fields)]))
+        return item
+
+    def _select_columns(self, section):
+        return ', '.join(f'"{field}"' for field in LIST_SECTIONS[section]) + ', extra'
+
+    def _read_section(self, conn, section):
+        rows = conn.execute(f'SELECT {self._select_columns(section)} FROM {section} ORDER BY position').fetchall()
+        return [self._row_to_item(section, row) for row in rows]
+
+    def _read_contact_info(self, conn):
+        return {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM contact_info')}
+
+    def _read_document(self, conn):
+        data = {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM settings')}
+        data['contact_info'] = self._read_contact_info(conn)
+        for section in LIST_SECTIONS:
+            data[section] = self._read_section(conn, section)
+        return data
+
+    def read_sections(self, names):
+        # Seules les tables (ou clés de settings) demandées sont lues.
+        with self.transaction(write=False) as conn:
+            revision = self._revision(conn)
+            if revision is not None:
+                sections = {}
+                for name in names:
+                    if name in LIST_SECTIONS:
+                        sections[name] = self._read_section(conn, name)
+                    elif name == 'contact_info':
+                        sections[name] = self._read_contact_info(conn)
+                    else:
+                        row = conn.execute('SELECT value FROM settings WHERE key = ?', (name,)).fetchone()
+                        if row:
+                            sections[name] = json.loads(row[0])
+                return sections, revision
+        data, revision = self.read()
+        return {name: data[name] for name in names if name in data}, revision
+
+    def section_names(self):
+        keys = [row[0] for row in self._connect().execute('SELECT key FROM settings')]
+        return keys + ['contact_info'] + list(LIST_SECTIONS)
+
+    def read(self):
+        with self.transaction(write=False) as conn:
+            revision = self._revision(conn)
+            if revision is not None:
+                data = self._read_document(conn)
+                apply_data_defaults(data)
+                return data, revision
+        # Base vide : import de data.json s'il existe, sinon contenu par défaut.
+        with self.lock():
+            if self.signature() is None:
+                if os.path.exists(DATA_FILE):
+                    seed, _ = JsonDataStore(DATA_FILE, self.lock_path).read()
+                else:
+                    seed = initial_site_data()
+                    apply_data_defaults(seed)
+                self.write(seed)
+        return self.read()
+
+    def write(self, data):
+        with self.transaction() as conn:
+            data['revision'] = self._bump_revision(conn, data.get('revision', 0))
+            conn.execute('DELETE FROM settings')
+            conn.execute('DELETE FROM contact_info')
+            for key, value in data.items():
+                if key in LIST_SECTIONS or key == 'contact_info':
+                    continue
+                conn.execute('INSERT INTO settings (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False)))
+            for key, value in (data.get('contact_info') or {}).items():
+                conn.execute('INSERT INTO contact_info (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False)))
+            for section in LIST_SECTIONS:
+                conn.execute(f'DELETE FROM {section}')
+                for position, item in enumerate(data.get(section) or []):
+                    self._insert_row(conn, section, position, item)
+            return data['revision']
+
+    def _insert_row(self, conn, section, position, item):
+        placeholders = ', '.join('?' for _ in range(len(LIST_SECTIONS[section]) + 2))
+        conn.execute(f'INSERT INTO {section} (position, {self._select_columns(section)}) VALUES ({placeholders})', [position] + self._item_to_row(section, item))
+
+    def _row_at(self, conn, section, index):
+        if index < 0:
+            return None
+        return conn.execute(f'SELECT id, {self._select_columns(section)} FROM {section} ORDER BY position LIMIT 1 OFFSET ?', (index,)).fetchone()
+
+    def modify_item(self, section, index, update):
+        with self.transaction() as conn:
+            row = self._row_at(conn, section, index)
+            if row is None:
+                return False
+            item = self._row_to_item(section, row[1:])
+            update(item)
+            assignments = ', '.join(f'"{field}" = ?' for field in LIST_SECTIONS[section])
+            conn.execute(f'UPDATE {section} SET {assignments}, extra = ? WHERE id = ?', self._item_to_row(section, item) + [row[0]])
+            self._bump_revision(conn)
+            return True
+
+    def append_item(self, section, item):
+        with self.transaction() as conn:
+            position = conn.execute(f'SELECT COALESCE(MAX(position) + 1, 0) FROM {section}').fetchone()[0]
+            self._insert_row(conn, section, position, item)
+            self._bump_revision(conn)
+            return True
+
+    def delete_item(self, section, index):
+        with self.transaction() as conn:
+            row = self._row_at(conn, section, index)
+            if row is None:
+                return False
+            position = conn.execute(f'SELECT position FROM {section} WHERE id = ?', (row[0],)).fetchone()[0]
+            conn.execute(f'DELETE FROM {section} WHERE id = ?', (row[0],))
+            conn.execute(f'UPDATE {section} SET position = position - 1 WHERE position > ?', (position,))
+            self._bump_revision(conn)
+            return True
+
+    def swap_items(self, section, index, other):
+        with self.transaction() as conn:
+            first = self._row_at(conn, section, index)
+            second = self._row_at(conn, section, other)
+            if first is None or second is None:
+                return False
+            positions = dict(conn.execute(f'SELECT id, position FROM {section} WHERE id IN (?, ?)', (first[0], second[0])))
+            conn.execute(f'UPDATE {section} SET position = ? WHERE id = ?', (positions[second[0]], first[0]))
+            conn.execute(f'UPDATE {section} SET position = ? WHERE id = ?', (positions[first[0]], second[0]))
+            self._bump_revision(conn)
+            return True
+
+    def modify_fields(self, update):
+        # update() reçoit les champs simples et contact_info, sans les sections en liste.
+        with self.transaction() as conn:
+            settings = {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM settings')}
+            contact = {key: json.loads(value) for key, value in conn.execute('SELECT key, value FROM contact_info')}
+            # Copie profonde : update() modifie les dictionnaires sur place, la comparaison
+            # se fait avec les valeurs lues.
+            fields = copy.deepcopy(dict(settings, contact_info=contact))
+            update(fields)
+            new_contact = fields.pop('contact_info', {}) or {}
+            for table, before, after in (('settings', settings, fields), ('contact_info', contact, new_contact)):
+                for key, value in after.items():
+                    if key != 'revision' and before.get(key) != value:
+                        conn.execute(f'INSERT OR REPLACE INTO {table} (key, value) VALUES (?, ?)', (key, json.dumps(value, ensure_ascii=False)))
+            self._bump_revision(conn)
+            return True
+
+
+def create_data_store(backend):
+    if backend == 'sqlite':
+        return SqliteDataStore(SQLITE_DATA_FILE, DATA_LOCK_FILE)
+    return JsonDataStore(DATA_FILE, DATA_LOCK_FILE)
+
+
+data_store = create_data_store(STORAGE_BACKEND)
+
+# Cache en lecture seule, section par section, partagé par toutes les requêtes du worker.
+# Il est vidé quand la signature du stockage change (mtime/taille pour JSON, révision pour SQLite).
+_site_data_lock = threading.RLock()
+_site_data_cache = {'signature': None, 'version': 0, 'sections': {}, 'names': None}
+_MISSING_SECTION = object()
+
+
+def freeze_data(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze_data(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_data(item) for item in value)
+    return value
+
+
+def thaw_data(value):
+    if isinstance(value, MappingProxyType):
+        return {key: thaw_data(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw_data(item) for item in value]
+    return value
+
+
+def _reset_site_data(signature):
+    # Appelé sous _site_data_lock.
+    _site_data_cache['signature'] = signature
+    _site_data_cache['sections'] = {}
+    _site_data_cache['names'] = None
+    _site_data_cache['version'] += 1
+
+
+def _store_site_data(data, signature):
+    with _site_data_lock:
+        _reset_site_data(signature)
+        _site_data_cache['sections'].update((name, freeze_data(value)) for name, value in data.items())
+        _site_data_cache['names'] = tuple(data)
+
+
+def invalidate_site_data():
+    with _site_data_lock:
+        _site_data_cache['signature'] = None
+
+
+def refresh_site_data():
+    signature = data_store.signature()
+    with _site_data_lock:
+        if signature is None or signature != _site_data_cache['signature']:
+            _reset_site_data(signature)
+        return _site_data_cache['version']
+
+
+def _load_site_sections(names):
+    with _site_data_lock:
+        cached = dict(_site_data_cache['sections'])
+    missing = [name for name in names if name not in cached]
+    if missing:
+        # La lecture se fait hors du verrou du cache (ordre des verrous : fichier puis cache).
+        loaded, signature = data_store.read_sections(missing)
+        loaded = {name: freeze_data(value) for name, value in loaded.items()}
+        loaded.update((name, _MISSING_SECTION) for name in missing if name not in loaded)
+        with _site_data_lock:
+            if signature != _site_data_cache['signature']:
+                _reset_site_data(signature)
+            _site_data_cache['sections'].update(loaded)
+        cached.update(loaded)
+    return {name: cached[name] for name in names if cached[name] is not _MISSING_SECTION}
+
+
+def _site_section_names():
+    # Liste des sections gardée avec le cache, relue seulement après un changement.
+    with _site_data_lock:
+        names, version = _site_data_cache['names'], _site_data_cache['version']
+    if names is None:
+        names = tuple(data_store.section_names())
+        with _site_data_lock:
+            if _site_data_cache['version'] == version:
+                _site_data_cache['names'] = names
+    return names
+
+
+class SiteData(Mapping):
+    # Vue immuable et paresseuse du document : une section n'est chargée (puis mise en cache)
+    # qu'au premier accès, par le code ou par le template. Les sections lourdes comme
+    # visa_tables_html ne sont donc lues que par les pages qui les affichent.
+    def __init__(self, prefetch=()):
+        refresh_site_data()
+        self._sections = _load_site_sections(list(prefetch)) if prefetch else {}
+
+    def __getitem__(self, name):
+        if name not in self._sections:
+            self._sections.update(_load_site_sections([name]))
+        return self._sections[name]
+
+    def __iter__(self):
+        return iter(_site_section_names())
+
+    def __len__(self):
+        return len(_site_section_names())
+
+
+def get_site_data(*prefetch):
+    # Vue immuable : à utiliser pour l'affichage, jamais pour une modification.
+    return SiteData(prefetch)
+
+
+def site_data_version():
+    with _site_data_lock:
+        return _site_data_cache['version']
+
+
+def load_data():
+    # Copie complète et modifiable (routes admin), relue depuis le stockage.
+    data, _ = data_store.read()
     return data
 
+
+@contextmanager
+def edit_data():
+    # Cycle lecture-modification-écriture protégé contre les autres workers :
+    # la copie est relue sous le verrou et save_data() doit être appelé avant la sortie.
+    with data_store.lock():
+        yield load_data()
+
+
+def backup_site_data(data=None):
+    if not s3_enabled():
+        return
+    if data is None:
+        data = load_data()
+    if BACKUP_SNAPSHOTS:
+        backup_data_snapshot(data)
+    else:
+        backup_bytes(serialize_data(data), 'data.json', 'application/json')
+
+
 def save_data(data):
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-    backup_file(DATA_FILE, 'data.json')
+    with data_store.lock():
+        signature = data_store.write(data)
+        _store_site_data(data, signature)
+    backup_site_data(data)
+    return signature
+
+
+def _after_data_change(changed):
+    if changed:
+        invalidate_site_data()
+        backup_site_data()
+    return changed
+
+
+# Modifications unitaires : seule la ligne concernée est écrite avec le stockage SQLite.
+def modify_data_item(section, index, update):
+    return _after_data_change(data_store.modify_item(section, index, update))
+
+
+def append_data_item(section, item):
+    return _after_data_change(data_store.append_item(section, item))
+
+
+def delete_data_item(section, index):
+    return _after_data_change(data_store.delete_item(section, index))
+
+
+def swap_data_items(section, index, other):
+    return _after_data_change(data_store.swap_items(section, index, other))
+
+
+def modify_data_fields(update):
+    return _after_data_change(data_store.modify_fields(update))
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+def fold_text(text):
+    # Minuscules sans accents, pour comparer « Hôtel » et « hotel ».
+    normalized = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in normalized if not unicodedata.combining(ch)).lower()
+
+
+# Journal des messages (messages.csv) : on n'y fait que des ajouts. Chaque message a un
+# identifiant stable (Id) ; une suppression ajoute une ligne « pierre tombale » (Op=D)
+# au lieu de réécrire le fichier. Le compactage ne réécrit le fichier que lorsque
+# suffisamment de lignes mortes se sont accumulées. La première ligne (Op=G) donne la
+# génération du fichier, qui change à chaque réécriture (voir backup_message_segment).
+MESSAGE_FIELDS = ['Date', 'Nom', 'Email', 'Telephone', 'Message']
+JOURNAL_FIELDS = ['Id', 'Op'] + MESSAGE_FIELDS
+
+# Index annexe (messages.csv.idx) : un en-tête (inode et taille du journal couverts,
+# nombre d'entrées) puis une entrée de taille fixe par enregistrement du journal
+# (position, longueur, opération, identifiant). Une page de l'inbox se lit en allant
+# directement aux positions de ses lignes, sans analyser tout le CSV.
+MESSAGES_INDEX_MAGIC = b'AZMSGIX1'
+MESSAGES_INDEX_HEADER = struct.Struct('<8sQQQ')
+MESSAGES_INDEX_ENTRY = struct.Struct('<QIc16s')
+_messages_lock = threading.RLock()
+_messages_index = {}
+
+
+def new_message_id():
+    return uuid.uuid4().hex[:16]
+
+
+def iter_csv_records(f):
+    # f est ouvert en binaire et positionné au début d'un enregistrement. Un enregistrement
+    # peut couvrir plusieurs lignes (champ entre guillemets) ; une ligne incomplète en fin
+    # de fichier (écriture en cours) n'est pas renvoyée.
+    offset = f.tell()
+    buffer = b''
+    quotes = 0
+    for line in iter(f.readline, b''):
+        buffer += line
+        quotes += line.count(b'"')
+        if quotes % 2 == 0 and buffer.endswith(b'\n'):
+            yield offset, buffer
+            offset += len(buffer)
+            buffer = b''
+            quotes = 0
+
+
+def parse_csv_record(raw):
+    return next(csv.reader(io.StringIO(raw.decode('utf-8-sig'), newline='')), [])
+
+
+def _empty_messages_index(inode=None):
+    # adds : (position, longueur, id) des messages dans l'ordre du journal ;
+    # dead : rangs (triés) des messages supprimés dans adds.
+    return {'inode': inode, 'offset': 0, 'count': 0, 'fields': None, 'generation': None,
+            'adds': [], 'positions': {}, 'dead': [], 'tombstones': 0}
+
+
+def _index_journal_entry(index, offset, length, op, message_id):
+    index['count'] += 1
+    if op == b'G':
+        index['generation'] = message_id
+        return
+    if op == b'D':
+        index['tombstones'] += 1
+        rank = index['positions'].pop(message_id, None)
+        if rank is not None:
+            bisect.insort(index['dead'], rank)
+        return
+    index['positions'][message_id] = len(index['adds'])
+    index['adds'].append((offset, length, message_id))
+
+
+def _read_index_file(index, journal_size):
+    # Reprend les entrées déjà calculées par un autre processus.
+    try:
+        with open(MESSAGES_FILE + '.idx', 'rb') as f:
+            magic, inode, covered, count = MESSAGES_INDEX_HEADER.unpack(f.read(MESSAGES_INDEX_HEADER.size))
+            if magic != MESSAGES_INDEX_MAGIC or inode != index['inode'] or covered > journal_size or count < index['count']:
+                return False
+            f.seek(MESSAGES_INDEX_HEADER.size + index['count'] * MESSAGES_INDEX_ENTRY.size)
+            for _ in range(count - index['count']):
+                offset, length, op, raw_id = MESSAGES_INDEX_ENTRY.unpack(f.read(MESSAGES_INDEX_ENTRY.size))
+                _index_journal_entry(index, offset, length, op, raw_id.rstrip(b'\0').decode('ascii'))
+            index['offset'] = covered
+            return True
+    except (OSError, struct.error, UnicodeDecodeError):
+        return False
+
+
+def _write_index_file(index, entries, rebuilt):
+    header = MESSAGES_INDEX_HEADER.pack(MESSAGES_INDEX_MAGIC, index['inode'], index['offset'], index['count'])
+    packed = b''.join(MESSAGES_INDEX_ENTRY.pack(*entry) for entry in entries)
+    path = MESSAGES_FILE + '.idx'
+    if rebuilt or not os.path.exists(path):
+        write_file_atomic(path, header + packed)
+        return
+    with open(path, 'r+b') as f:
+        # Les entrées d'abord, l'en-tête ensuite : une écriture interrompue laisse un index
+        # cohérent (les entrées en trop sont ignorées puis écrasées).
+        f.seek(MESSAGES_INDEX_HEADER.size + (index['count'] - len(entries)) * MESSAGES_INDEX_ENTRY.size)
+        f.write(packed)
+        f.truncate()
+        f.seek(0)
+        f.write(header)
+
+
+def _journal_fields():
+    with open(MESSAGES_FILE, 'rb') as f:
+        for _, raw in iter_csv_records(f):
+            return parse_csv_record(raw)
+    return None
+
+
+def _refresh_messages():
+    # Met l'index à jour : rien à faire si le journal n'a pas bougé, rattrapage des
+    # seules nouvelles lignes s'il a grandi, reconstruction s'il a été réécrit.
+    global _messages_index
+    try:
+        stat = os.stat(MESSAGES_FILE)
+    except OSError:
+        with _messages_lock:
+            _messages_index = _empty_messages_index()
+            return _messages_index
+    with _messages_lock:
+        index = _messages_index
+        if index.get('inode') == stat.st_ino and index['offset'] == stat.st_size:
+            return index
+    with file_lock(MESSAGES_FILE + '.lock'), _messages_lock:
+        stat = os.stat(MESSAGES_FILE)
+        index = _messages_index
+        rebuilt = index.get('inode') != stat.st_ino or index['offset'] > stat.st_size
+        if rebuilt:
+            index = _empty_messages_index(stat.st_ino)
+        if index['fields'] is None:
+            index['fields'] = _journal_fields()
+            if index['fields'] is not None and 'Id' not in index['fields']:
+                _migrate_legacy_messages()
+                _messages_index = _empty_messages_index()
+                return _refresh_messages()
+        if _read_index_file(index, stat.st_size):
+            rebuilt = False
+        elif not rebuilt:
+            # Index annexe absent ou illisible : on le reconstruit entièrement.
+            index = _empty_messages_index(stat.st_ino)
+            index['fields'] = _journal_fields()
+            rebuilt = True
+        entries = []
+        with open(MESSAGES_FILE, 'rb') as f:
+            f.seek(index['offset'])
+            for offset, raw in iter_csv_records(f):
+                record = dict(zip(index['fields'], parse_csv_record(raw)))
+                if offset > 0:
+                    op = record.get('Op', 'A').encode('ascii') if record.get('Op') in ('D', 'G') else b'A'
+                    message_id = record.get('Id', '')
+                    entries.append((offset, len(raw), op, message_id.encode('ascii')))
+                    _index_journal_entry(index, offset, len(raw), op, message_id)
+                index['offset'] = offset + len(raw)
+        if entries or rebuilt:
+            _write_index_file(index, entries, rebuilt)
+        _messages_index = index
+        if index['generation'] is None and index['offset'] > 0:
+            # Journal sans génération (créé avant les sauvegardes par segments) : réécriture.
+            save_messages(load_messages())
+            return _refresh_messages()
+        return index
+
+
+def _migrate_legacy_messages():
+    # Ancien format (sans Id ni Op) : conversion unique en journal.
+    with file_lock(MESSAGES_FILE + '.lock'):
+        with open(MESSAGES_FILE, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            if 'Id' in (reader.fieldnames or []):
+                return
+            rows = list(reader)
+        save_messages(rows)
+
+
+class JournalReplaced(Exception):
+    pass
+
+
+def retry_if_journal_replaced(func):
+    # Le journal a pu être réécrit (compactage par un autre worker) entre la mise à jour
+    # de l'index et la lecture : les positions ne valent plus rien, on recommence.
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except JournalReplaced:
+                incr_metric('messages.reread')
+    return wrapper
+
+
+def _read_message_rows(index, ranks):
+    rows = []
+    with open(MESSAGES_FILE, 'rb') as f:
+        if os.fstat(f.fileno()).st_ino != index['inode']:
+            raise JournalReplaced()
+        for rank in ranks:
+            offset, length, message_id = index['adds'][rank]
+            f.seek(offset)
+            record = dict(zip(index['fields'], parse_csv_record(f.read(length))))
+            row = {field: record.get(field, '') for field in MESSAGE_FIELDS}
+            row['Id'] = message_id
+            rows.append(row)
+    return rows
+
+
+def _live_rank(index, position):
+    # Rang dans adds du message vivant numéro « position » (0 = le plus ancien) :
+    # plus petit rang r tel que r + 1 - (supprimés <= r) > position.
+    dead = index['dead']
+    low, high = position, position + len(dead)
+    while low < high:
+        middle = (low + high) // 2
+        if middle + 1 - bisect.bisect_right(dead, middle) > position:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+@retry_if_journal_replaced
+def messages_page(page=1, page_size=MESSAGES_PAGE_SIZE):
+    # Page de l'inbox, du plus récent au plus ancien.
+    index = _refresh_messages()
+    with _messages_lock:
+        total = len(index['positions'])
+        pages = max(1, -(-total // page_size))
+        page = min(max(1, page), pages)
+        start = (page - 1) * page_size
+        ranks = []
+        if start < total:
+            rank = _live_rank(index, total - 1 - start)
+            dead = index['dead']
+            while rank >= 0 and len(ranks) < page_size:
+                position = bisect.bisect_left(dead, rank)
+                if position < len(dead) and dead[position] == rank:
+                    rank -= 1
+                    continue
+                ranks.append(rank)
+                rank -= 1
+        rows = _read_message_rows(index, ranks) if ranks else []
+    return {'messages': rows, 'page': page, 'page_size': page_size, 'pages': pages, 'total': total}
+
+
+# Index inversé pour la recherche dans les messages : terme -> {rang dans adds: poids}.
+# Construit à la première recherche puis complété au fil des ajouts.
+MESSAGE_SEARCH_WEIGHTS = {'Nom': 3.0, 'Email': 3.0, 'Telephone': 3.0, 'Message': 1.0}
+_messages_search = {}
+
+
+def search_terms(text):
+    return re.findall(r'\w+', fold_text(text))
+
+
+def _message_search_terms(row):
+    weights = {}
+    for field, weight in MESSAGE_SEARCH_WEIGHTS.items():
+        value = row.get(field, '')
+        terms = search_terms(value)
+        if field == 'Telephone':
+            # Numéro complet sans espaces ni séparateurs.
+            terms.append(re.sub(r'\D', '', value))
+        for term in terms:
+            if term:
+                weights[term] = weights.get(term, 0.0) + weight
+    return weights
+
+
+def _update_message_search(index):
+    # Appelé avec _messages_lock : indexe les messages ajoutés depuis le dernier passage.
+    global _messages_search
+    search = _messages_search
+    if search.get('inode') != index['inode'] or search['count'] > len(index['adds']):
+        search = {'inode': index['inode'], 'count': 0, 'postings': {}, 'vocabulary': []}
+    ranks = range(search['count'], len(index['adds']))
+    if ranks:
+        for rank, row in zip(ranks, _read_message_rows(index, ranks)):
+            for term, weight in _message_search_terms(row).items():
+                postings = search['postings'].get(term)
+                if postings is None:
+                    postings = search['postings'][term] = {}
+                    bisect.insort(search['vocabulary'], term)
+                postings[rank] = weight
+        search['count'] = len(index['adds'])
+    _messages_search = search
+    return search
+
+
+@retry_if_journal_replaced
+def search_messages(query, limit=MESSAGES_PAGE_SIZE):
+    # Tous les mots de la requête doivent apparaître (en préfixe d'un terme indexé) ;
+    # score TF-IDF pondéré par champ, puis les plus récents d'abord à score égal.
+    terms = search_terms(query)
+    if not terms:
+        return {'query': query, 'total': 0, 'messages': []}
+    index = _refresh_messages()
+    with _messages_lock:
+        search = _update_message_search(index)
+        vocabulary = search['vocabulary']
+        live = len(index['positions']) or 1
+        dead = set(index['dead'])
+        scores = None
+        for term in terms:
+            matches = {}
+            position = bisect.bisect_left(vocabulary, term)
+            while position < len(vocabulary) and vocabulary[position].startswith(term):
+                postings = search['postings'][vocabulary[position]]
+                idf = math.log(1 + live / len(postings))
+                for rank, weight in postings.items():
+                    if rank not in dead:
+                        matches[rank] = max(matches.get(rank, 0.0), weight * idf)
+                position += 1
+            if scores is None:
+                scores = matches
+            else:
+                scores = {rank: score + matches[rank] for rank, score in scores.items() if rank in matches}
+            if not scores:
+                break
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        rows = _read_message_rows(index, [rank for rank, _ in best]) if best else []
+    for row, (_, score) in zip(rows, best):
+        row['Score'] = round(score, 3)
+    return {'query': query, 'total': len(scores), 'messages': rows}
+
+
+@retry_if_journal_replaced
 def load_messages():
-    if not os.path.exists(MESSAGES_FILE):
-        return []
-    with open(MESSAGES_FILE, 'r', encoding='utf-8', newline='') as f:
-        reader = csv.DictReader(f)
-        return list(reader)
+    index = _refresh_messages()
+    with _messages_lock:
+        dead = set(index['dead'])
+        ranks = [rank for rank in range(len(index['adds'])) if rank not in dead]
+        return _read_message_rows(index, ranks) if ranks else []
 
-def append_message(row):
-    file_exists = os.path.exists(MESSAGES_FILE)
-    fieldnames = ['Date', 'Nom', 'Email', 'Telephone', 'Message']
-    with open(MESSAGES_FILE, 'a', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
+
+def _append_journal(records):
+    # Renvoie la génération, la position et les octets ajoutés (pour la sauvegarde).
+    with file_lock(MESSAGES_FILE + '.lock'):
+        index = _refresh_messages()
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=JOURNAL_FIELDS, extrasaction='ignore')
+        if index['offset'] == 0:
             writer.writeheader()
-        writer.writerow(row)
-    backup_file(MESSAGES_FILE, 'messages.csv')
+            writer.writerow({'Id': new_message_id(), 'Op': 'G'})
+        writer.writerows(records)
+        payload = buffer.getvalue().encode('utf-8')
+        with open(MESSAGES_FILE, 'ab') as f:
+            offset = f.tell()
+            f.write(payload)
+        # Indexation immédiate des lignes ajoutées.
+        index = _refresh_messages()
+        with _messages_lock:
+            if _messages_search:
+                _update_message_search(index)
+        return index['generation'], offset, payload
+
+
+def append_message(row):
+    message_id = new_message_id()
+    backup_message_segment(*_append_journal([dict(row, Id=message_id, Op='A')]))
+    return message_id
+
+
+def delete_message_entry(message_id):
+    with file_lock(MESSAGES_FILE + '.lock'):
+        index = _refresh_messages()
+        if message_id not in index['positions']:
+            return False
+        backup_message_segment(*_append_journal([{'Id': message_id, 'Op': 'D'}]))
+        compact_messages()
+    return True
+
+
+def compact_messages(force=False):
+    with file_lock(MESSAGES_FILE + '.lock'):
+        index = _refresh_messages()
+        live = len(index['positions'])
+        dead = len(index['dead']) + index['tombstones']
+        if not force and (dead < MESSAGES_COMPACT_MIN or dead < live * MESSAGES_COMPACT_RATIO):
+            return False
+        save_messages(load_messages())
+        incr_metric('messages.compactions')
+        return True
+
 
 def save_messages(rows):
-    fieldnames = ['Date', 'Nom', 'Email', 'Telephone', 'Message']
-    with open(MESSAGES_FILE, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-    backup_file(MESSAGES_FILE, 'messages.csv')
+    # Réécriture complète (compactage / migration) : uniquement des lignes vivantes,
+    # sous une nouvelle génération.
+    generation = new_message_id()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=JOURNAL_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerow({'Id': generation, 'Op': 'G'})
+    writer.writerows(dict(row, Id=row.get('Id') or new_message_id(), Op='A') for row in rows)
+    payload = buffer.getvalue().encode('utf-8')
+    with file_lock(MESSAGES_FILE + '.lock'):
+        write_file_atomic(MESSAGES_FILE, payload)
+    backup_message_segment(generation, 0, payload)
+
+
+# Sauvegarde des messages par segments immuables :
+# messages/<génération>/<position>.csv contient les octets ajoutés au journal à cette
+# position, et messages/manifest.json désigne la génération courante. Un envoi de
+# formulaire ne transfère donc que sa propre ligne ; seule une réécriture renvoie
+# le fichier entier (segment 0 d'une nouvelle génération).
+def messages_backup_prefix():
+    return backup_key('messages')
+
+
+def message_segment_key(generation, offset):
+    return f"{messages_backup_prefix()}/{generation}/{offset:012d}.csv"
+
+
+def upload_message_base(key, source, content_type):
+    generation, payload = source
+    upload_file_to_s3(io.BytesIO(payload), message_segment_key(generation, 0), content_type)
+    manifest = {
+        'generation': generation,
+        'base': message_segment_key(generation, 0),
+        'updated_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    upload_file_to_s3(io.BytesIO(serialize_data(manifest)), key, 'application/json')
+
+
+def backup_message_segment(generation, offset, payload):
+    if not s3_enabled():
+        return
+    if offset == 0:
+        # Nouvelle génération : segment de base puis manifest.
+        submit_backup(f"{messages_backup_prefix()}/manifest.json", (generation, payload), 'text/csv', handler=upload_message_base)
+        return
+    submit_backup(message_segment_key(generation, offset), payload, 'text/csv')
+
+
+def read_message_backup(generation=None):
+    # Réassemble le journal à partir des segments ; les positions doivent se suivre.
+    if generation is None:
+        obj = _s3_client.get_object(Bucket=S3_BUCKET, Key=f"{messages_backup_prefix()}/manifest.json")
+        generation = json.loads(obj['Body'].read())['generation']
+    prefix = f"{messages_backup_prefix()}/{generation}/"
+    keys = []
+    for page in _s3_client.get_paginator('list_objects_v2').paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        keys.extend(item['Key'] for item in page.get('Contents', []))
+    payload = b''
+    for key in sorted(keys):
+        offset = int(key[len(prefix):].split('.')[0])
+        if offset != len(payload):
+            raise ValueError(f"segment manquant à la position {len(payload)} (trouvé {offset})")
+        payload += _s3_client.get_object(Bucket=S3_BUCKET, Key=key)['Body'].read()
+    if not payload:
+        raise ValueError(f"aucun segment pour la génération {generation}")
+    return generation, payload
+
 
 def login_required(f):
     @wraps(f)
@@ -520,26 +2991,76 @@ if FORCE_HTTPS:
 # --- ROUTES PUBLIQUES ---
 @app.route('/')
 def index():
-    return render_template('index.html', data=load_data(), flight_results=None, flight_error=None, flight_query={})
+    flight_query = {'dep_iata': default_departure_iata()}
+    return render_template('index.html', data=get_site_data(), flight_results=None, flight_error=None, flight_query=flight_query)
+
+
+# Réponses de /iata-suggest (corps JSON et ETag) par requête normalisée et version du
+# jeu de données : une nouvelle version ne réutilise jamais les anciennes entrées.
+_suggest_cache = LRUCache(IATA_SUGGEST_CACHE_SIZE)
+
 
 @app.route('/iata-suggest')
 def iata_suggest():
-    query = request.args.get('q', '')
-    return jsonify(suggest_airports(query))
+    index = load_iata_index()
+    query = fold_text(request.args.get('q', '').strip())
+    cache_key = (index.version, query)
+    cached = _suggest_cache.get(cache_key)
+    if cached is None:
+        incr_metric('iata_suggest.miss')
+        body = app.json.dumps(suggest_airports(query), separators=(',', ':')).encode('utf-8')
+        cached = (body, hashlib.sha256(body).hexdigest()[:20])
+        _suggest_cache.put(cache_key, cached)
+    else:
+        incr_metric('iata_suggest.hit')
+    body, etag = cached
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IATA_SUGGEST_MAX_AGE
+    return response.make_conditional(request)
 
-@app.route('/flight-search', methods=['POST'])
-def flight_search():
-    dep_iata = (request.form.get('departure') or '').strip().upper()
-    arr_iata = (request.form.get('arrival') or '').strip().upper()
-    flight_date = (request.form.get('flight_date') or '').strip()
-    return_date = (request.form.get('return_date') or '').strip()
-    trip_type = (request.form.get('trip_type') or '2').strip()
-    travel_class = (request.form.get('travel_class') or '1').strip()
-    passengers = parse_int(request.form.get('passengers'), default=1, min_value=1, max_value=9)
-    max_price_value = (request.form.get('max_price') or '').strip()
+@app.route('/nearest-airports')
+def nearest_airports_route():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    limit = min(max(1, request.args.get('limit', 5, type=int)), 20)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'Paramètres lat et lon invalides.'}), 400
+    response = jsonify({'airports': nearest_airports(lat, lon, limit)})
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
+
+# Pools de threads nommés, recréés après un fork (les threads du parent n'existent plus).
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+
+
+def thread_pool(name, workers):
+    with _thread_pools_lock:
+        pid, pool = _thread_pools.get(name, (None, None))
+        if pool is None or pid != os.getpid():
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            _thread_pools[name] = (os.getpid(), pool)
+        return pool
+
+
+def parse_flight_search_form(form):
+    dep_iata = (form.get('departure') or '').strip().upper()
+    arr_iata = (form.get('arrival') or '').strip().upper()
+    flight_date = (form.get('flight_date') or '').strip()
+    return_date = (form.get('return_date') or '').strip()
+    trip_type = (form.get('trip_type') or '2').strip()
+    travel_class = (form.get('travel_class') or '1').strip()
+    passengers = parse_int(form.get('passengers'), default=1, min_value=1, max_value=9)
+    max_price_value = (form.get('max_price') or '').strip()
     max_price = parse_int(max_price_value, default=None, min_value=0)
-    direct_only = request.form.get('direct_only') == 'on'
-    deep_search = request.form.get('deep_search') == 'on'
+    direct_only = form.get('direct_only') == 'on'
+    deep_search = form.get('deep_search') == 'on'
+    flexible_dates = form.get('flexible_dates') == 'on'
+    nearby_airports = form.get('nearby_airports') == 'on'
     if trip_type not in {'1', '2'}:
         trip_type = '2'
     if travel_class not in {'1', '2', '3', '4'}:
@@ -554,37 +3075,345 @@ def flight_search():
         'passengers': passengers,
         'max_price': max_price if max_price is not None else max_price_value,
         'direct_only': direct_only,
-        'deep_search': deep_search
+        'deep_search': deep_search,
+        'flexible_dates': flexible_dates,
+        'nearby_airports': nearby_airports
     }
     if not dep_iata or not arr_iata or not flight_date:
-        error = "Veuillez renseigner le depart, l'arrivee et la date."
-        return render_template('index.html', data=load_data(), flight_results=[], flight_error=error, flight_query=flight_query)
+        return flight_query, None, "Veuillez renseigner le depart, l'arrivee et la date."
     if trip_type == '1' and not return_date:
-        error = "Veuillez renseigner la date de retour."
-        return render_template('index.html', data=load_data(), flight_results=[], flight_error=error, flight_query=flight_query)
-    results, error = fetch_flight_schedule(
-        dep_iata,
-        arr_iata,
-        flight_date,
-        return_date=return_date,
-        trip_type=trip_type,
-        travel_class=travel_class,
-        passengers=passengers,
-        max_price=max_price,
-        direct_only=direct_only,
-        deep_search=deep_search
+        return flight_query, None, "Veuillez renseigner la date de retour."
+    search = {
+        'dep_iata': dep_iata,
+        'arr_iata': arr_iata,
+        'flight_date': flight_date,
+        'return_date': return_date,
+        'trip_type': trip_type,
+        'travel_class': travel_class,
+        'passengers': passengers,
+        'max_price': max_price,
+        'direct_only': direct_only,
+        'deep_search': deep_search
+    }
+    return flight_query, search, None
+
+
+def search_wait(timeout, deadline=None):
+    return timeout if deadline is None else max(0, min(timeout, deadline - time.time()))
+
+
+def cheapest_flight(flights):
+    prices = [flight for flight in flights if isinstance(flight.get('price'), (int, float))]
+    return min(prices, key=lambda flight: flight['price']) if prices else None
+
+
+def flight_flex_spread():
+    return min(FLIGHT_FLEX_DAYS, max(0, (FLIGHT_SEARCH_MAX_CALLS - 1) // 2))
+
+
+def flexible_searches(search, spread):
+    # Aller et retour décalés ensemble (même durée de séjour) : 2 * spread + 1 recherches.
+    try:
+        flight_date = datetime.strptime(search['flight_date'], '%Y-%m-%d').date()
+        return_date = datetime.strptime(search['return_date'], '%Y-%m-%d').date() if search['trip_type'] == '1' else None
+    except ValueError:
+        return []
+    today = datetime.now().date()
+    searches = []
+    for offset in range(-spread, spread + 1):
+        day = flight_date + timedelta(days=offset)
+        if day < today:
+            continue
+        shifted = dict(search, flight_date=day.isoformat())
+        if return_date:
+            shifted['return_date'] = (return_date + timedelta(days=offset)).isoformat()
+        searches.append((offset, shifted))
+    return searches
+
+
+def flight_sort_key(flight):
+    price = flight.get('price')
+    minutes = flight.get('duration_minutes')
+    return (
+        not isinstance(price, (int, float)), price if isinstance(price, (int, float)) else 0,
+        not isinstance(minutes, int), minutes if isinstance(minutes, int) else 0,
     )
+
+
+def merge_flight_results(result_lists):
+    # Un même vol peut remonter par plusieurs paires d'aéroports : dédoublonnage sur
+    # compagnie, numéro et heure de départ, en gardant le moins cher.
+    merged = {}
+    for flights in result_lists:
+        for flight in flights:
+            key = (flight.get('airline'), flight.get('flight_number'), flight.get('dep_time'))
+            if key not in merged or flight_sort_key(flight) < flight_sort_key(merged[key]):
+                merged[key] = flight
+    return sorted(merged.values(), key=flight_sort_key)[:FLIGHT_MULTI_MAX_RESULTS]
+
+
+def multi_airport_pairs(dep_iata, arr_iata, limit=None):
+    # Paire demandée d'abord, puis les paires dont les aéroports sont les plus fréquentés.
+    index = load_iata_index()
+
+    def popularity(code):
+        rank = index.rank_of(code)
+        return index.popularity(rank) if rank is not None else 0
+
+    requested = ((dep_iata or '').strip().upper(), (arr_iata or '').strip().upper())
+    pairs = [(dep, arr) for dep in iata_city_group(dep_iata) for arr in iata_city_group(arr_iata) if dep != arr]
+    pairs.sort(key=lambda pair: (pair != requested, -(popularity(pair[0]) + popularity(pair[1]))))
+    return pairs[:FLIGHT_MULTI_MAX_PAIRS if limit is None else min(limit, FLIGHT_MULTI_MAX_PAIRS)]
+
+
+def fetch_multi_airport_flights(dep_iata, arr_iata, flight_date, max_pairs=None, **options):
+    # Toutes les paires départ x arrivée des groupes (au plus max_pairs appels), en parallèle ;
+    # à l'échéance, les résultats déjà reçus sont affichés sans attendre les retardataires.
+    pairs = multi_airport_pairs(dep_iata, arr_iata, max_pairs)
+    if len(pairs) <= 1:
+        return fetch_flight_schedule(dep_iata, arr_iata, flight_date, **options)
+    pool = thread_pool('flight-multi', FLIGHT_MULTI_WORKERS)
+    futures = [pool.submit(fetch_flight_schedule, dep, arr, flight_date, **options) for dep, arr in pairs]
+    wait_futures(futures, timeout=search_wait(FLIGHT_MULTI_DEADLINE, options.get('deadline')))
+    result_lists = []
+    errors = []
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            incr_metric('flight_multi.late')
+            errors.append("Impossible de contacter l'API pour le moment.")
+            continue
+        flights, error = future.result()
+        result_lists.append(flights)
+        if error:
+            errors.append(error)
+    flights = merge_flight_results(result_lists)
+    if flights:
+        return flights, None
+    return [], errors[0] if errors else "Aucun vol trouve pour ces criteres."
+
+
+def fetch_price_calendar(search, spread=None, fetch_selected=None):
+    # Les recherches des jours voisins partent en parallèle ; celles qui n'ont pas
+    # répondu à l'échéance commune apparaissent sans prix. Renvoie aussi la recherche
+    # du jour demandé, déjà lancée avec les autres (par fetch_selected s'il est donné ;
+    # les jours voisins restent sur la paire d'aéroports demandée).
+    searches = flexible_searches(search, FLIGHT_FLEX_DAYS if spread is None else spread)
+    pool = thread_pool('flight-flex', FLIGHT_FLEX_WORKERS)
+    futures = [(offset, shifted, pool.submit((offset == 0 and fetch_selected) or fetch_flight_schedule, **shifted)) for offset, shifted in searches]
+    wait_futures([future for _, _, future in futures], timeout=search_wait(FLIGHT_FLEX_DEADLINE, search.get('deadline')))
+    calendar = []
+    selected = None
+    for offset, shifted, future in futures:
+        if offset == 0:
+            selected = future
+        day = {'date': shifted['flight_date'], 'return_date': shifted['return_date'], 'selected': offset == 0, 'price': None, 'currency': None, 'cheapest': False}
+        if future.done():
+            flight = cheapest_flight(future.result()[0])
+            if flight:
+                day['price'], day['currency'] = flight['price'], flight['currency']
+        else:
+            if offset != 0:
+                future.cancel()
+            incr_metric('flight_flex.late')
+        calendar.append(day)
+    prices = [day['price'] for day in calendar if day['price'] is not None]
+    for day in calendar:
+        day['cheapest'] = bool(prices) and day['price'] == min(prices)
+    return calendar, selected
+
+
+def run_flight_search(search, flexible=False, nearby=False):
+    # Budget global : aucun appel ne part après l'échéance, et les délais réseau sont réduits d'autant.
+    search = dict(search, deadline=time.time() + FLIGHT_SEARCH_BUDGET)
+    # Au plus FLIGHT_SEARCH_MAX_CALLS appels : le calendrier est réduit pour tenir, et les
+    # aéroports voisins se partagent ce qui reste une fois les autres jours comptés.
+    spread = flight_flex_spread() if flexible else 0
+    other_days = sum(1 for offset, _ in flexible_searches(search, spread) if offset) if flexible else 0
+    fetch = fetch_flight_schedule
+    if nearby:
+        fetch = partial(fetch_multi_airport_flights, max_pairs=max(1, FLIGHT_SEARCH_MAX_CALLS - other_days))
+    calendar = None
+    selected = None
+    if flexible:
+        calendar, selected = fetch_price_calendar(search, spread, fetch)
+    results, error = selected.result() if selected else fetch(**search)
     if not error and not results:
         error = "Aucun vol trouve pour ces criteres."
-    return render_template('index.html', data=load_data(), flight_results=results, flight_error=error, flight_query=flight_query)
+    return {'flight_results': results, 'flight_error': error, 'flight_calendar': calendar}
+
+
+@app.route('/flight-search', methods=['POST'])
+def flight_search():
+    flight_query, search, error = parse_flight_search_form(request.form)
+    if error:
+        return render_template('index.html', data=get_site_data(), flight_results=[], flight_error=error, flight_query=flight_query)
+    return render_template('index.html', data=get_site_data(), flight_query=flight_query, **run_flight_search(search, flight_query['flexible_dates'], flight_query['nearby_airports']))
+
+
+# Recherches en tâche de fond : le POST rend la main tout de suite avec un identifiant,
+# la page interroge ensuite /flight-search/jobs/<id> (ou écoute /events). L'état et le
+# résultat des tâches sont dans une base SQLite commune : n'importe quel worker répond
+# au suivi. Un identifiant inconnu (ou expiré) renvoie 404 et la page retombe sur le
+# formulaire classique.
+class FlightJobStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS flight_jobs (id TEXT PRIMARY KEY, created REAL NOT NULL, result TEXT)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT INTO flight_jobs (id, created) VALUES (?, ?)', (job_id, now))
+        conn.execute('DELETE FROM flight_jobs WHERE created < ?', (now - FLIGHT_JOB_KEEP,))
+
+    def finish(self, job_id, result):
+        self._connect().execute('UPDATE flight_jobs SET result = ? WHERE id = ?', (json.dumps(result, ensure_ascii=False), job_id))
+
+    def get(self, job_id):
+        # None si la tâche est inconnue, {} tant qu'elle tourne, sinon son résultat.
+        row = self._connect().execute('SELECT result FROM flight_jobs WHERE id = ? AND created >= ?', (job_id, time.time() - FLIGHT_JOB_KEEP)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]) if row[0] else {}
+
+
+flight_jobs = FlightJobStore(FLIGHT_JOB_FILE)
+_flight_job_futures = set()
+_flight_job_futures_lock = threading.Lock()
+
+
+def run_flight_job(job_id, search, flexible, nearby):
+    try:
+        result = run_flight_search(search, flexible, nearby)
+    except Exception:
+        app.logger.exception("Flight search job %s failed", job_id)
+        result = {'flight_results': [], 'flight_error': "Impossible de contacter l'API pour le moment.", 'flight_calendar': None}
+    try:
+        flight_jobs.finish(job_id, result)
+    except sqlite3.Error as exc:
+        app.logger.warning("Flight job store write failed: %s", exc)
+
+
+def submit_flight_job(search, flexible=False, nearby=False):
+    # La file reste bornée par worker (FLIGHT_JOB_QUEUE tâches en cours au plus).
+    with _flight_job_futures_lock:
+        _flight_job_futures.difference_update([future for future in _flight_job_futures if future.done()])
+        if len(_flight_job_futures) >= FLIGHT_JOB_QUEUE:
+            incr_metric('flight_jobs.rejected')
+            return None
+        job_id = uuid.uuid4().hex
+        try:
+            flight_jobs.create(job_id)
+        except sqlite3.Error as exc:
+            app.logger.warning("Flight job store write failed: %s", exc)
+            return None
+        _flight_job_futures.add(thread_pool('flight-job', FLIGHT_JOB_WORKERS).submit(run_flight_job, job_id, search, flexible, nearby))
+    incr_metric('flight_jobs.submitted')
+    return job_id
+
+
+def get_flight_job(job_id):
+    try:
+        return flight_jobs.get(job_id)
+    except sqlite3.Error as exc:
+        app.logger.warning("Flight job store read failed: %s", exc)
+        return None
+
+
+@app.route('/flight-search/jobs', methods=['POST'])
+def flight_search_job():
+    flight_query, search, error = parse_flight_search_form(request.form)
+    if error:
+        return jsonify({'status': 'done', 'html': render_template('flight_results.html', flight_results=[], flight_error=error, flight_calendar=None)}), 400
+    job_id = submit_flight_job(search, flight_query['flexible_dates'], flight_query['nearby_airports'])
+    if job_id is None:
+        return jsonify({'error': 'busy'}), 503
+    return jsonify({
+        'job': job_id,
+        'poll': url_for('flight_search_job_status', job_id=job_id),
+        'events': url_for('flight_search_job_events', job_id=job_id) if FLIGHT_JOB_SSE else None,
+        'interval': FLIGHT_JOB_POLL_MS,
+        'timeout': FLIGHT_JOB_TIMEOUT
+    }), 202
+
+
+@app.route('/flight-search/jobs/<job_id>')
+def flight_search_job_status(job_id):
+    result = get_flight_job(job_id)
+    if result is None:
+        return jsonify({'status': 'unknown'}), 404
+    if not result:
+        return jsonify({'status': 'pending'})
+    return jsonify({'status': 'done', 'html': render_template('flight_results.html', **result)})
+
+
+@app.route('/flight-search/jobs/<job_id>/events')
+def flight_search_job_events(job_id):
+    # Garde une connexion ouverte jusqu'au résultat : à réserver aux workers threadés.
+    if get_flight_job(job_id) is None:
+        return jsonify({'status': 'unknown'}), 404
+
+    def stream():
+        deadline = time.time() + FLIGHT_JOB_TIMEOUT
+        result = get_flight_job(job_id)
+        while not result:
+            if result is None or time.time() >= deadline:
+                yield 'event: timeout\ndata: {}\n\n'
+                return
+            yield ': attente\n\n'
+            time.sleep(FLIGHT_JOB_POLL_MS / 1000)
+            result = get_flight_job(job_id)
+        payload = json.dumps({'status': 'done', 'html': render_template('flight_results.html', **result)}, ensure_ascii=False)
+        yield f'event: done\ndata: {payload}\n\n'
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/flight-status')
+def flight_status():
+    numbers = parse_flight_numbers(request.args.get('flights'))
+    if numbers:
+        watch_flights(numbers)
+    statuses, updated = flight_statuses(numbers)
+    return render_template(
+        'flight_status.html',
+        data=get_site_data(),
+        flight_numbers=' '.join(numbers),
+        statuses=statuses,
+        updated=format_api_datetime(updated) if updated else '',
+        refresh_ms=int(FLIGHT_STATUS_INTERVAL * 1000)
+    )
+
+@app.route('/flight-status/data')
+def flight_status_data():
+    numbers = parse_flight_numbers(request.args.get('flights'))
+    if numbers:
+        watch_flights(numbers)
+    statuses, updated = flight_statuses(numbers)
+    return jsonify({'flights': statuses, 'updated': updated})
 
 @app.route('/services')
 def services():
-    return render_template('services.html', data=load_data())
+    return render_template('services.html', data=get_site_data())
 
 @app.route('/destinations')
 def destinations():
-    site_data = load_data()
+    site_data = get_site_data('destinations', 'services')
     query = request.args.get('query', '').strip().lower()
     destinations_list = site_data['destinations']
     services_list = site_data['services']
@@ -599,7 +3428,7 @@ def destinations():
 
 @app.route('/contact')
 def contact():
-    return render_template('contact.html', data=load_data())
+    return render_template('contact.html', data=get_site_data())
 
 @app.route('/contact_form', methods=['POST'])
 def contact_form():
@@ -655,36 +3484,74 @@ def logout():
 @app.route('/admin')
 @login_required
 def admin():
-    return render_template('admin.html', data=load_data(), messages=load_messages())
+    query = request.args.get('q', '').strip()
+    if query:
+        inbox = search_messages(query, MESSAGES_MAX_PAGE_SIZE)
+        return render_template('admin.html', data=get_site_data(), messages=inbox['messages'], inbox=inbox)
+    inbox = messages_page(*messages_page_args())
+    return render_template('admin.html', data=get_site_data(), messages=inbox['messages'], inbox=inbox)
+
+
+def messages_page_args():
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', MESSAGES_PAGE_SIZE, type=int)
+    return page, min(max(1, page_size), MESSAGES_MAX_PAGE_SIZE)
 
-@app.route('/admin/messages/delete/<int:index>')
+
+@app.route('/admin/messages')
+@login_required
+def admin_messages():
+    return jsonify(messages_page(*messages_page_args()))
+
+
+@app.route('/admin/messages/search')
+@login_required
+def admin_messages_search():
+    limit = min(max(1, request.args.get('limit', MESSAGES_PAGE_SIZE, type=int)), MESSAGES_MAX_PAGE_SIZE)
+    return jsonify(search_messages(request.args.get('q', ''), limit))
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    metrics = metrics_snapshot()
+    metrics['backup.pending'] = backup_uploader.pending()
+    lookups = metrics.get('iata_suggest.hit', 0) + metrics.get('iata_suggest.miss', 0)
+    if lookups:
+        metrics['iata_suggest.hit_ratio'] = round(metrics.get('iata_suggest.hit', 0) / lookups, 4)
+    metrics['iata_suggest.cached'] = len(_suggest_cache)
+    for name, breaker in breakers.items():
+        metrics[f'breaker.{name}.state'] = breaker.state
+    flight_lookups = sum(metrics.get(f'flight_cache.{name}', 0) for name in ('hit', 'stale', 'miss'))
+    if flight_lookups:
+        metrics['flight_cache.hit_ratio'] = round((metrics.get('flight_cache.hit', 0) + metrics.get('flight_cache.stale', 0)) / flight_lookups, 4)
+    for upstream in ('airlabs', 'serpapi'):
+        connections = metrics.get(f'http.{upstream}.connections', 0)
+        if connections:
+            metrics[f'http.{upstream}.handshake_avg_ms'] = round(metrics[f'http.{upstream}.handshake_ms'] / connections, 1)
+    return jsonify(metrics)
+
+@app.route('/admin/messages/delete/<message_id>')
 @login_required
-def delete_message(index):
-    messages = load_messages()
-    if 0 <= index < len(messages):
-        messages.pop(index)
-        save_messages(messages)
+def delete_message(message_id):
+    if delete_message_entry(message_id):
         flash('Message supprimé.', 'success')
     return redirect(url_for('admin'))
 
 @app.route('/upload_logo', methods=['POST'])
 @login_required
 def upload_logo():
-    site_data = load_data()
     if 'logo' in request.files and request.files['logo'].filename != '':
         file = request.files['logo']
         if allowed_file(file.filename):
             stored_path = save_upload(file, '')
             if stored_path:
-                site_data['logo'] = stored_path
-            save_data(site_data)
+                modify_data_fields(lambda site_data: site_data.update({'logo': stored_path}))
             flash('Logo mis à jour !')
     return redirect(url_for('admin'))
 
 @app.route('/admin/destination/add', methods=['POST'])
 @login_required
 def add_destination():
-    site_data = load_data()
     new_dest = {"nom": request.form['nom'], "description": request.form['description'], "prix": request.form['prix'], "image": ""}
     if 'image' in request.files and request.files['image'].filename != '':
         file = request.files['image']
@@ -692,27 +3559,29 @@ def add_destination():
             stored_path = save_upload(file, 'destinations')
             if stored_path:
                 new_dest['image'] = stored_path
-    site_data['destinations'].append(new_dest)
-    save_data(site_data)
+    append_data_item('destinations', new_dest)
     flash('Destination ajoutée !')
     return redirect(url_for('admin'))
 
 @app.route('/admin/destination/edit/<int:index>', methods=['GET', 'POST'])
 @login_required
 def edit_destination(index):
-    site_data = load_data()
+    site_data = get_site_data()
     destination = site_data['destinations'][index]
     if request.method == 'POST':
-        destination['nom'] = request.form['nom']
-        destination['description'] = request.form['description']
-        destination['prix'] = request.form['prix']
+        stored_path = ''
         if 'image' in request.files and request.files['image'].filename != '':
             file = request.files['image']
             if allowed_file(file.filename):
                 stored_path = save_upload(file, 'destinations')
-                if stored_path:
-                    destination['image'] = stored_path
-        save_data(site_data)
+
+        def update(destination):
+            destination['nom'] = request.form['nom']
+            destination['description'] = request.form['description']
+            destination['prix'] = request.form['prix']
+            if stored_path:
+                destination['image'] = stored_path
+        modify_data_item('destinations', index, update)
         flash('Destination modifiée !')
         return redirect(url_for('admin'))
     return render_template('edit_destination.html', data=site_data, destination=destination, index=index)
@@ -720,10 +3589,7 @@ def edit_destination(index):
 @app.route('/admin/destination/delete/<int:index>')
 @login_required
 def delete_destination(index):
-    site_data = load_data()
-    if 0 <= index < len(site_data['destinations']):
-        site_data['destinations'].pop(index)
-        save_data(site_data)
+    if delete_data_item('destinations', index):
         flash('Destination supprimée !')
     return redirect(url_for('admin'))
 
@@ -731,55 +3597,46 @@ def delete_destination(index):
 @app.route('/admin/destination/move_up/<int:index>')
 @login_required
 def move_destination_up(index):
-    site_data = load_data()
-    if 0 < index < len(site_data['destinations']):
-        site_data['destinations'][index], site_data['destinations'][index - 1] = site_data['destinations'][index - 1], site_data['destinations'][index]
-        save_data(site_data)
+    if index > 0 and swap_data_items('destinations', index, index - 1):
         flash('Ordre des destinations mis à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/destination/move_down/<int:index>')
 @login_required
 def move_destination_down(index):
-    site_data = load_data()
-    if 0 <= index < len(site_data['destinations']) - 1:
-        site_data['destinations'][index], site_data['destinations'][index + 1] = site_data['destinations'][index + 1], site_data['destinations'][index]
-        save_data(site_data)
+    if swap_data_items('destinations', index, index + 1):
         flash('Ordre des destinations mis à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/site_info', methods=['POST'])
 @login_required
 def update_site_info():
-    site_data = load_data()
-    site_data['company_name'] = request.form.get('company_name', site_data.get('company_name', '')).strip() or site_data.get('company_name', '')
-    site_data['tagline'] = request.form.get('tagline', site_data.get('tagline', '')).strip() or site_data.get('tagline', '')
-    contact = site_data.get('contact_info', {})
-    contact['telephone'] = request.form.get('telephone', contact.get('telephone', '')).strip()
-    contact['email'] = request.form.get('email', contact.get('email', '')).strip()
-    contact['adresse'] = request.form.get('adresse', contact.get('adresse', '')).strip()
-    contact['horaires'] = request.form.get('horaires', contact.get('horaires', '')).strip()
-    socials = contact.get('social_links', {})
-    socials['facebook'] = request.form.get('facebook', socials.get('facebook', '')).strip()
-    socials['instagram'] = request.form.get('instagram', socials.get('instagram', '')).strip()
-    socials['tiktok'] = request.form.get('tiktok', socials.get('tiktok', '')).strip()
-    contact['social_links'] = socials
-    site_data['contact_info'] = contact
-    save_data(site_data)
+    def update(site_data):
+        site_data['company_name'] = request.form.get('company_name', site_data.get('company_name', '')).strip() or site_data.get('company_name', '')
+        site_data['tagline'] = request.form.get('tagline', site_data.get('tagline', '')).strip() or site_data.get('tagline', '')
+        contact = site_data.get('contact_info', {})
+        contact['telephone'] = request.form.get('telephone', contact.get('telephone', '')).strip()
+        contact['email'] = request.form.get('email', contact.get('email', '')).strip()
+        contact['adresse'] = request.form.get('adresse', contact.get('adresse', '')).strip()
+        contact['horaires'] = request.form.get('horaires', contact.get('horaires', '')).strip()
+        socials = contact.get('social_links', {})
+        socials['facebook'] = request.form.get('facebook', socials.get('facebook', '')).strip()
+        socials['instagram'] = request.form.get('instagram', socials.get('instagram', '')).strip()
+        socials['tiktok'] = request.form.get('tiktok', socials.get('tiktok', '')).strip()
+        contact['social_links'] = socials
+        site_data['contact_info'] = contact
+    modify_data_fields(update)
     flash('Informations du site mises À jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/service/edit/<int:index>', methods=['POST'])
 @login_required
 def edit_service_entry(index):
-    site_data = load_data()
-    services = site_data.get('services', [])
-    if 0 <= index < len(services):
-        service = services[index]
+    def update(service):
         service['nom'] = request.form.get('nom', service.get('nom', '')).strip()
         service['description'] = request.form.get('description', service.get('description', '')).strip()
         service['icon'] = request.form.get('icon', service.get('icon', '')).strip()
-        save_data(site_data)
+    if modify_data_item('services', index, update):
         flash('Service mis À jour.')
     else:
         flash('Service introuvable.', 'danger')
@@ -788,14 +3645,11 @@ def edit_service_entry(index):
 @app.route('/admin/whyus/edit/<int:index>', methods=['POST'])
 @login_required
 def edit_whyus_entry(index):
-    site_data = load_data()
-    why_us = site_data.get('why_us', [])
-    if 0 <= index < len(why_us):
-        item = why_us[index]
+    def update(item):
         item['title'] = request.form.get('title', item.get('title', '')).strip()
         item['description'] = request.form.get('description', item.get('description', '')).strip()
         item['icon'] = request.form.get('icon', item.get('icon', '')).strip()
-        save_data(site_data)
+    if modify_data_item('why_us', index, update):
         flash('Bloc \"Pourquoi nous choisir\" mis À jour.')
     else:
         flash('Bloc introuvable.', 'danger')
@@ -804,46 +3658,33 @@ def edit_whyus_entry(index):
 @app.route('/admin/assurance/html', methods=['POST'])
 @login_required
 def update_assurance_html():
-    site_data = load_data()
-    site_data['assurance_tables_html'] = request.form.get('assurance_tables_html', '').strip()
-    save_data(site_data)
+    html = request.form.get('assurance_tables_html', '').strip()
+    modify_data_fields(lambda site_data: site_data.update({'assurance_tables_html': html}))
     flash('Tableaux assurance mis à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/visa/html', methods=['POST'])
 @login_required
 def update_visa_html():
-    site_data = load_data()
-    site_data['visa_tables_html'] = request.form.get('visa_tables_html', '').strip()
-    save_data(site_data)
+    html = request.form.get('visa_tables_html', '').strip()
+    modify_data_fields(lambda site_data: site_data.update({'visa_tables_html': html}))
     flash('Tableaux visa mis à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/individuel/edit/<int:index>', methods=['POST'])
 @login_required
 def edit_assurance_individuel(index):
-    site_data = load_data()
-    rows = site_data.get('assurance_individuel', [])
-    if 0 <= index < len(rows):
-        row = rows[index]
-        row['duree'] = request.form.get('duree', row.get('duree', '')).strip()
-        row['enfant'] = request.form.get('enfant', row.get('enfant', '')).strip()
-        row['adulte'] = request.form.get('adulte', row.get('adulte', '')).strip()
-        row['60_64'] = request.form.get('60_64', row.get('60_64', '')).strip()
-        row['65_69'] = request.form.get('65_69', row.get('65_69', '')).strip()
-        row['70_74'] = request.form.get('70_74', row.get('70_74', '')).strip()
-        row['75_79'] = request.form.get('75_79', row.get('75_79', '')).strip()
-        row['80_85'] = request.form.get('80_85', row.get('80_85', '')).strip()
-        save_data(site_data)
+    def update(row):
+        for key in LIST_SECTIONS['assurance_individuel']:
+            row[key] = request.form.get(key, row.get(key, '')).strip()
+    if modify_data_item('assurance_individuel', index, update):
         flash('Ligne assurance (individuel) mise à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/individuel/add', methods=['POST'])
 @login_required
 def add_assurance_individuel():
-    site_data = load_data()
-    rows = site_data.setdefault('assurance_individuel', [])
-    rows.append({
+    append_data_item('assurance_individuel', {
         'duree': request.form.get('duree', '').strip(),
         'enfant': request.form.get('enfant', '').strip(),
         'adulte': request.form.get('adulte', '').strip(),
@@ -853,44 +3694,30 @@ def add_assurance_individuel():
         '75_79': request.form.get('75_79', '').strip(),
         '80_85': request.form.get('80_85', '').strip(),
     })
-    save_data(site_data)
     flash('Ligne assurance (individuel) ajoutée.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/individuel/delete/<int:index>')
 @login_required
 def delete_assurance_individuel(index):
-    site_data = load_data()
-    rows = site_data.get('assurance_individuel', [])
-    if 0 <= index < len(rows):
-        rows.pop(index)
-        save_data(site_data)
+    if delete_data_item('assurance_individuel', index):
         flash('Ligne supprimée.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/famille/edit/<int:index>', methods=['POST'])
 @login_required
 def edit_assurance_famille(index):
-    site_data = load_data()
-    rows = site_data.get('assurance_famille', [])
-    if 0 <= index < len(rows):
-        row = rows[index]
-        row['duree'] = request.form.get('duree', row.get('duree', '')).strip()
-        row['p2'] = request.form.get('p2', row.get('p2', '')).strip()
-        row['p3'] = request.form.get('p3', row.get('p3', '')).strip()
-        row['p4'] = request.form.get('p4', row.get('p4', '')).strip()
-        row['p5'] = request.form.get('p5', row.get('p5', '')).strip()
-        row['p6'] = request.form.get('p6', row.get('p6', '')).strip()
-        save_data(site_data)
+    def update(row):
+        for key in LIST_SECTIONS['assurance_famille']:
+            row[key] = request.form.get(key, row.get(key, '')).strip()
+    if modify_data_item('assurance_famille', index, update):
         flash('Ligne assurance famille mise à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/famille/add', methods=['POST'])
 @login_required
 def add_assurance_famille():
-    site_data = load_data()
-    rows = site_data.setdefault('assurance_famille', [])
-    rows.append({
+    append_data_item('assurance_famille', {
         'duree': request.form.get('duree', '').strip(),
         'p2': request.form.get('p2', '').strip(),
         'p3': request.form.get('p3', '').strip(),
@@ -898,40 +3725,30 @@ def add_assurance_famille():
         'p5': request.form.get('p5', '').strip(),
         'p6': request.form.get('p6', '').strip(),
     })
-    save_data(site_data)
     flash('Ligne assurance famille ajoutée.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/assurance/famille/delete/<int:index>')
 @login_required
 def delete_assurance_famille(index):
-    site_data = load_data()
-    rows = site_data.get('assurance_famille', [])
-    if 0 <= index < len(rows):
-        rows.pop(index)
-        save_data(site_data)
+    if delete_data_item('assurance_famille', index):
         flash('Ligne supprimée.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/visa/row/edit/<int:index>', methods=['POST'])
 @login_required
 def edit_visa_row(index):
-    site_data = load_data()
-    rows = site_data.get('visa_rows', [])
-    if 0 <= index < len(rows):
-        row = rows[index]
-        for key in ['category', 'destination', 'visa_type', 'duree', 'delai', 'tarif', 'tarif_total', 'docs']:
+    def update(row):
+        for key in LIST_SECTIONS['visa_rows']:
             row[key] = request.form.get(key, row.get(key, '')).strip()
-        save_data(site_data)
+    if modify_data_item('visa_rows', index, update):
         flash('Ligne visa mise à jour.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/visa/row/add', methods=['POST'])
 @login_required
 def add_visa_row():
-    site_data = load_data()
-    rows = site_data.setdefault('visa_rows', [])
-    rows.append({
+    append_data_item('visa_rows', {
         'category': request.form.get('category', '').strip(),
         'destination': request.form.get('destination', '').strip(),
         'visa_type': request.form.get('visa_type', '').strip(),
@@ -941,32 +3758,26 @@ def add_visa_row():
         'tarif_total': request.form.get('tarif_total', '').strip(),
         'docs': request.form.get('docs', '').strip(),
     })
-    save_data(site_data)
     flash('Ligne visa ajoutée.')
     return redirect(url_for('admin'))
 
 @app.route('/admin/visa/row/delete/<int:index>')
 @login_required
 def delete_visa_row(index):
-    site_data = load_data()
-    rows = site_data.get('visa_rows', [])
-    if 0 <= index < len(rows):
-        rows.pop(index)
-        save_data(site_data)
+    if delete_data_item('visa_rows', index):
         flash('Ligne supprimée.')
     return redirect(url_for('admin'))
 
 @app.route('/service/<service_name>')
 def service_detail(service_name):
-    site_data = load_data()
+    site_data = get_site_data()
     service = next((s for s in site_data['services'] if s['nom'] == service_name), None)
     if not service:
         flash("Service introuvable.", "danger")
         return redirect(url_for('services'))
 
     # Route based on normalized name to avoid encoding issues.
-    normalized_name = unicodedata.normalize('NFKD', service_name or '')
-    normalized_name = ''.join(ch for ch in normalized_name if not unicodedata.combining(ch)).lower()
+    normalized_name = fold_text(service_name)
     if "visa" in normalized_name:
         return render_template('visa_service.html', data=site_data, service=service)
     if "assurance" in normalized_name:
@@ -986,10 +3797,217 @@ def service_detail(service_name):
 
 @app.route('/destinations')
 def destinations_page():  # autre nom de fonction
-    site_data = load_data()
+    site_data = get_site_data()
     return render_template('destinations.html', data=site_data)
 
 
+# --- COMMANDES CLI (flask --app app <commande>) ---
+@app.cli.command('migrate-data')
+@click.option('--source', default=DATA_FILE, show_default=True, help='Fichier JSON à importer.')
+@click.option('--target', default=SQLITE_DATA_FILE, show_default=True, help='Base SQLite de destination.')
+@click.option('--force', is_flag=True, help='Remplace le contenu existant de la base.')
+def migrate_data_command(source, target, force):
+    """Importe data.json dans la base SQLite (STORAGE_BACKEND=sqlite)."""
+    if not os.path.exists(source):
+        raise click.ClickException(f"Fichier introuvable : {source}")
+    sqlite_store = SqliteDataStore(target, DATA_LOCK_FILE)
+    if sqlite_store.signature() is not None and not force:
+        raise click.ClickException(f"{target} contient déjà des données (utilisez --force).")
+    data, _ = JsonDataStore(source, DATA_LOCK_FILE).read()
+    revision = sqlite_store.write(data)
+    counts = ', '.join(f"{section}={len(data.get(section) or [])}" for section in LIST_SECTIONS)
+    click.echo(f"Import terminé dans {target} (révision {revision}) : {counts}")
+
+
+@app.cli.command('bench-storage')
+@click.option('--iterations', default=200, show_default=True)
+def bench_storage_command(iterations):
+    """Compare la latence d'une modification unitaire entre les stockages JSON et SQLite."""
+    data, _ = JsonDataStore(DATA_FILE, DATA_LOCK_FILE).read()
+    if not data.get('destinations'):
+        raise click.ClickException("Aucune destination dans data.json : rien à modifier.")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lock_path = os.path.join(tmp_dir, 'data.lock')
+        # Le JSON fait un fsync à chaque écriture : SQLite est mesuré à durabilité égale
+        # (FULL) et avec le réglage utilisé en production (NORMAL).
+        stores = [
+            ('fsync', JsonDataStore(os.path.join(tmp_dir, 'data.json'), lock_path)),
+            ('synchronous=FULL', SqliteDataStore(os.path.join(tmp_dir, 'full.sqlite3'), lock_path, 'FULL')),
+            ('synchronous=NORMAL', SqliteDataStore(os.path.join(tmp_dir, 'normal.sqlite3'), lock_path)),
+        ]
+        for durability, store in stores:
+            store.write(thaw_data(freeze_data(data)))
+            timings = []
+            for i in range(iterations):
+                started = time.perf_counter()
+                store.modify_item('destinations', i % len(data['destinations']), lambda item: item.update({'prix': f"€{i}"}))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            click.echo(f"{store.name:<7} {durability:<19} moyenne {sum(timings) / len(timings):.3f} ms  p50 {timings[len(timings) // 2]:.3f} ms  p95 {timings[int(len(timings) * 0.95)]:.3f} ms")
+
+
+@app.cli.command('build-airports')
+@click.option('--source', default=IATA_DATA_FILE, show_default=True)
+@click.option('--output', default=IATA_BINARY_FILE, show_default=True)
+def build_airports_command(source, output):
+    """Compile iata_airports.json en fichier binaire projeté en mémoire par les workers."""
+    with open(source, 'r', encoding='utf-8') as f:
+        airports = json.load(f)
+    payload = compile_iata_airports(airports, iata_source_digest(source))
+    write_file_atomic(output, payload)
+    click.echo(f"{len(airports)} aéroports -> {output} ({len(payload)} octets, JSON {os.path.getsize(source)} octets)")
+
+
+_AIRPORT_BENCH_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+import app
+
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+before = rss()
+started = time.perf_counter()
+app.IATA_DATA_FILE, app.IATA_BINARY_FILE = sys.argv[2], sys.argv[3]
+index = app.load_iata_index()
+loaded = time.perf_counter() - started
+started = time.perf_counter()
+for query in ('par', 'alg', 'lon', 'dub', 'setif', 'new york'):
+    app.suggest_airports(query)
+queries = (time.perf_counter() - started) / 6
+print(json.dumps({'kind': index.kind, 'count': len(index), 'load_ms': loaded * 1000, 'query_ms': queries * 1000, 'rss': rss() - before}))
+"""
+
+
+@app.cli.command('build-airport-shards')
+@click.option('--output', default=IATA_SHARDS_DIR, show_default=True)
+def build_airport_shards_command(output):
+    """Génère les fragments statiques d'autocomplétion des aéroports sous static/iata."""
+    index = open_iata_index(binary_path='')
+    current, count = build_iata_shards(index, output)
+    click.echo(f"{count} fichiers dans {output} (manifest {current['manifest']}, {len(index)} aéroports)")
+
+
+@app.cli.command('bench-airports')
+@click.option('--scale', default=1, show_default=True, help='Duplique la liste pour simuler un jeu de données plus grand.')
+def bench_airports_command(scale):
+    """Compare le démarrage (temps, mémoire) de l'index des aéroports JSON et compilé."""
+    with open(IATA_DATA_FILE, 'r', encoding='utf-8') as f:
+        airports = json.load(f)
+    airports = [dict(airport, iata=airport['iata'] if copy == 0 else chr(65 + copy % 26) + airport['iata'][1:],
+                     city=airport['city'] if copy == 0 else f"{airport['city']} {copy}")
+                for copy in range(scale) for airport in airports]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'airports.json')
+        binary_path = os.path.join(tmp_dir, 'airports.bin')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(airports, f, ensure_ascii=False)
+        write_file_atomic(binary_path, compile_iata_airports(airports, iata_source_digest(json_path)))
+        for path in ('', binary_path):
+            output = subprocess.run([sys.executable, '-c', _AIRPORT_BENCH_SCRIPT, os.path.dirname(os.path.abspath(__file__)), json_path, path],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            click.echo(f"{result['kind']:<7} {result['count']} aéroports  chargement {result['load_ms']:.1f} ms  "
+                       f"requête {result['query_ms']:.3f} ms  RSS +{result['rss'] / 1024 / 1024:.1f} Mo")
+
+
+@app.cli.command('compact-messages')
+def compact_messages_command():
+    """Réécrit messages.csv sans les messages supprimés."""
+    before = os.path.getsize(MESSAGES_FILE) if os.path.exists(MESSAGES_FILE) else 0
+    compact_messages(force=True)
+    backup_uploader.flush(BACKUP_FLUSH_TIMEOUT)
+    click.echo(f"messages.csv compacté : {before} -> {os.path.getsize(MESSAGES_FILE)} octets, {len(load_messages())} messages.")
+
+
+@app.cli.command('restore-messages')
+@click.option('--generation', default=None, help='Génération à restaurer (par défaut celle du manifest).')
+@click.option('--yes', is_flag=True, help='Ne pas demander de confirmation.')
+def restore_messages_command(generation, yes):
+    """Reconstruit messages.csv à partir des segments sauvegardés sur S3."""
+    global _messages_index
+    if not s3_enabled():
+        raise click.ClickException("S3 n'est pas configuré (S3_BUCKET).")
+    try:
+        generation, payload = read_message_backup(generation)
+    except (ValueError, KeyError, BotoCoreError, ClientError) as exc:
+        raise click.ClickException(f"Restauration impossible : {exc}")
+    if not yes:
+        click.confirm(f"Remplacer {MESSAGES_FILE} par la génération {generation} ({len(payload)} octets) ?", abort=True)
+    with file_lock(MESSAGES_FILE + '.lock'):
+        write_file_atomic(MESSAGES_FILE, payload)
+        with _messages_lock:
+            _messages_index = {}
+    click.echo(f"{MESSAGES_FILE} restauré : {len(load_messages())} messages (génération {generation}).")
+
+
+@app.cli.command('poll-flight-status')
+def poll_flight_status_command():
+    """Interroge AirLabs une fois pour les vols suivis et met à jour le fichier de statuts."""
+    if not AIRLABS_API_KEY:
+        raise click.ClickException("AIRLABS_API_KEY n'est pas configurée.")
+    calls = poll_flight_statuses()
+    click.echo(f"{FLIGHT_STATUS_FILE} mis à jour ({calls} appel(s) AirLabs).")
+
+
+@app.cli.group('snapshots')
+def snapshots_group():
+    """Historique des sauvegardes de data.json sur S3 (BACKUP_SNAPSHOTS=1)."""
+    if not s3_enabled():
+        raise click.ClickException("S3 n'est pas configuré (S3_BUCKET).")
+
+
+@snapshots_group.command('list')
+def snapshots_list_command():
+    for entry in read_snapshot_manifest().get('snapshots', []):
+        click.echo(f"{entry['created_at']}  rev {entry.get('revision')!s:>5}  {entry['sha256'][:12]}  {entry['size']} octets")
+
+
+@snapshots_group.command('diff')
+@click.argument('old_ref')
+@click.argument('new_ref', default='local')
+def snapshots_diff_command(old_ref, new_ref):
+    """Compare deux versions (empreinte, révision, 'latest' ou 'local')."""
+    manifest = read_snapshot_manifest()
+    texts = []
+    for ref in (old_ref, new_ref):
+        if ref == 'local':
+            data = load_data()
+            data.pop('revision', None)
+            texts.append(serialize_data(data).decode('utf-8'))
+            continue
+        entry = find_snapshot(manifest, ref)
+        if entry is None:
+            raise click.ClickException(f"Version introuvable : {ref}")
+        texts.append(read_snapshot(entry).decode('utf-8'))
+    diff = difflib.unified_diff(texts[0].splitlines(), texts[1].splitlines(), old_ref, new_ref, lineterm='')
+    for line in diff:
+        click.echo(line)
+
+
+@snapshots_group.command('restore')
+@click.argument('ref')
+@click.option('--yes', is_flag=True, help='Ne pas demander de confirmation.')
+def snapshots_restore_command(ref, yes):
+    entry = find_snapshot(read_snapshot_manifest(), ref)
+    if entry is None:
+        raise click.ClickException(f"Version introuvable : {ref}")
+    payload = read_snapshot(entry)
+    if hashlib.sha256(payload).hexdigest() != entry['sha256']:
+        raise click.ClickException("Empreinte invalide : la sauvegarde est corrompue.")
+    if not yes:
+        click.confirm(f"Restaurer la révision {entry.get('revision')} ({entry['sha256'][:12]}) ?", abort=True)
+    with edit_data() as current:
+        data = json.loads(payload)
+        data['revision'] = current.get('revision', 0)
+        save_data(data)
+    backup_uploader.flush(BACKUP_FLUSH_TIMEOUT)
+    click.echo(f"Révision {entry.get('revision')} restaurée (nouvelle révision {data['revision']}).")
+
+
 # ==============================================
 # TEMPLATES HTML
 # ==============================================
@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUCKET = 'backup-test'
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    # Application dans un dossier temporaire (data.json, messages.csv) avec un S3 simulé ;
+    # sauvegardes envoyées directement, sans le thread d'envoi.
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    shutil.copy(os.path.join(ROOT, 'data.json'), tmp_path / 'data.json')
+    monkeypatch.chdir(tmp_path)
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        import app
+        monkeypatch.setattr(app, 'S3_BUCKET', BUCKET)
+        monkeypatch.setattr(app, '_s3_client', client)
+        monkeypatch.setattr(app, 'BACKUP_ASYNC', False)
+        monkeypatch.setattr(app, '_snapshot_state', {'digest': None})
+        monkeypatch.setattr(app, '_messages_index', {})
+        monkeypatch.setattr(app, '_messages_search', {})
+        yield app
+
+
+def s3_keys(app, prefix):
+    listing = app._s3_client.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
+    return sorted(item['Key'] for item in listing.get('Contents', []))
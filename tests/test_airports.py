@@ -0,0 +1,19 @@
+import json
+
+
+def test_compiled_index_matches_json(app_module, tmp_path):
+    with open(app_module.IATA_DATA_FILE, 'r', encoding='utf-8') as f:
+        airports = json.load(f)
+    path = tmp_path / 'iata_airports.bin'
+    path.write_bytes(app_module.compile_iata_airports(airports, app_module.iata_source_digest(app_module.IATA_DATA_FILE)))
+    source = app_module.AirportIndex(airports)
+    compiled = app_module.MappedAirportIndex(str(path))
+    assert len(compiled) == len(source)
+    for rank in range(len(source)):
+        expected, actual = source.airport(rank), compiled.airport(rank)
+        # Mêmes clés, mêmes valeurs et mêmes types (popularité entière, lat/lon).
+        assert actual == expected
+        assert {key: type(value) for key, value in actual.items()} == {key: type(value) for key, value in expected.items()}
+        assert compiled.popularity(rank) == source.popularity(rank)
+        assert compiled.position(rank) == source.position(rank)
+        assert compiled.label(rank) == source.label(rank)
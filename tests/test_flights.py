@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+FLIGHT_DAY = (date.today() + timedelta(days=30)).isoformat()
+
+
+def serpapi_payload(params, flights):
+    return {'search_metadata': {'status': 'Success'}, 'best_flights': [
+        {'price': price, 'total_duration': duration, 'flights': [{
+            'airline': 'Air Algerie', 'flight_number': number,
+            'departure_airport': {'id': params['departure_id'], 'time': f"{params['outbound_date']} {dep_time}"},
+            'arrival_airport': {'id': params['arrival_id'], 'time': f"{params['outbound_date']} 23:00"},
+        }]}
+        for number, dep_time, price, duration in flights
+    ]}
+
+
+class FakeSerpApi:
+    # SerpApi simulé : chaque appel est noté ; la réponse se règle par respond.
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+        self.respond = lambda params: serpapi_payload(params, [('AH 1020', '10:00', 100, 120)])
+
+    def __call__(self, params, deadline=None):
+        with self._lock:
+            self.calls.append(dict(params))
+        return self.respond(params), None
+
+
+@pytest.fixture
+def serpapi(app_module, tmp_path, monkeypatch):
+    fake = FakeSerpApi()
+    monkeypatch.setattr(app_module, 'SERPAPI_KEY', 'test')
+    monkeypatch.setattr(app_module, 'call_serpapi', fake)
+    monkeypatch.setattr(app_module, 'flight_cache', app_module.MemoryFlightCache(100))
+    monkeypatch.setattr(app_module, 'flight_jobs', app_module.FlightJobStore(str(tmp_path / 'flight_jobs.sqlite3')))
+    monkeypatch.setattr(app_module, '_thread_pools', {})
+    monkeypatch.setattr(app_module, '_metrics', {})
+    yield fake
+    for _, pool in app_module._thread_pools.values():
+        pool.shutdown(wait=True)
+
+
+def flight_search(**changes):
+    search = {'dep_iata': 'ORN', 'arr_iata': 'CDG', 'flight_date': FLIGHT_DAY, 'return_date': '', 'trip_type': '2',
+              'travel_class': '1', 'passengers': 1, 'max_price': None, 'direct_only': False, 'deep_search': False}
+    search.update(changes)
+    return search
+
+
+@pytest.mark.parametrize('flexible, nearby, expected', [(False, False, 1), (True, False, 7), (False, True, 6), (True, True, 12)])
+def test_upstream_calls_per_search_mode(app_module, serpapi, flexible, nearby, expected):
+    result = app_module.run_flight_search(flight_search(), flexible, nearby)
+
+    assert result['flight_results']
+    assert len(serpapi.calls) == expected <= app_module.FLIGHT_SEARCH_MAX_CALLS
+    assert len({json.dumps(params, sort_keys=True) for params in serpapi.calls}) == expected
+    if flexible:
+        assert len(result['flight_calendar']) == 7
+        # Le calendrier reste sur la paire demandée ; les voisins ne servent que le jour choisi.
+        assert {(params['departure_id'], params['arrival_id']) for params in serpapi.calls if params['outbound_date'] != FLIGHT_DAY} == {('ORN', 'CDG')}
+
+
+def test_call_cap_shrinks_date_spread(app_module, serpapi, monkeypatch):
+    monkeypatch.setattr(app_module, 'FLIGHT_SEARCH_MAX_CALLS', 5)
+
+    result = app_module.run_flight_search(flight_search(), True, True)
+
+    assert len(result['flight_calendar']) == 5
+    assert len(serpapi.calls) == 5
+
+
+def test_late_calendar_days_are_cancelled_at_deadline(app_module, serpapi, monkeypatch):
+    release = threading.Event()
+    respond = serpapi.respond
+    serpapi.respond = lambda params: release.wait(5) and respond(params)
+    monkeypatch.setattr(app_module, 'FLIGHT_FLEX_WORKERS', 1)
+    monkeypatch.setattr(app_module, 'FLIGHT_FLEX_DEADLINE', 0.2)
+
+    started = time.monotonic()
+    calendar, selected = app_module.fetch_price_calendar(flight_search(), 3)
+
+    assert time.monotonic() - started < 2
+    assert [day['price'] for day in calendar] == [None] * 7
+    assert app_module.metrics_snapshot()['flight_flex.late'] == 7
+    release.set()
+    assert selected.result(timeout=5)[0]
+    app_module._thread_pools['flight-flex'][1].shutdown(wait=True)
+    # Seuls le premier jour (déjà parti) et le jour demandé ont appelé l'API.
+    first_day = (date.fromisoformat(FLIGHT_DAY) - timedelta(days=3)).isoformat()
+    assert sorted(params['outbound_date'] for params in serpapi.calls) == [first_day, FLIGHT_DAY]
+
+
+def test_multi_airport_results_are_merged_and_deduplicated(app_module, serpapi):
+    # Le même vol remonte par chaque paire, à un prix différent ; un second vol n'existe qu'au départ d'ORN.
+    def respond(params):
+        prices = {'ORN': 180, 'ALG': 150, 'CZL': 170}
+        flights = [('AH 1020', '10:00', prices[params['departure_id']], 120)]
+        if params['departure_id'] == 'ORN':
+            flights.append(('AH 1030', '14:00', 90, 200))
+        return serpapi_payload(params, flights)
+
+    serpapi.respond = respond
+    flights, error = app_module.fetch_multi_airport_flights('ORN', 'CDG', FLIGHT_DAY)
+
+    assert error is None
+    assert [(flight['flight_number'], flight['price']) for flight in flights] == [('AH 1030', 90), ('AH 1020', 150)]
+
+
+def test_merge_sorts_by_price_then_duration(app_module):
+    flights = app_module.merge_flight_results([
+        [{'airline': 'A', 'flight_number': '1', 'dep_time': '10:00', 'price': 200, 'duration_minutes': 90}],
+        [{'airline': 'B', 'flight_number': '2', 'dep_time': '11:00', 'price': 100, 'duration_minutes': 300},
+         {'airline': 'C', 'flight_number': '3', 'dep_time': '12:00', 'price': 100, 'duration_minutes': 120},
+         {'airline': 'D', 'flight_number': '4', 'dep_time': '13:00', 'price': None, 'duration_minutes': 60}],
+    ])
+
+    assert [flight['airline'] for flight in flights] == ['C', 'B', 'A', 'D']
+
+
+def test_singleflight_coalesces_and_bounds_followers(app_module):
+    calls = []
+    release = threading.Event()
+    flight = app_module.SingleFlight()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    with pytest.raises(TimeoutError):
+        flight.do('key', slow, time.time() + 0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [('result', False), ('result', True), ('result', True)]
+
+
+def test_breaker_opens_then_half_opens(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'BREAKER_MIN_CALLS', 4)
+    monkeypatch.setattr(app_module, 'BREAKER_COOLDOWN', 0.1)
+    breaker = app_module.CircuitBreaker('test')
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    time.sleep(0.15)
+    # Un seul appel d'essai ; son succès referme le disjoncteur.
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == 'closed'
+
+
+def test_slow_deep_search_does_not_open_breaker(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'BREAKER_MIN_CALLS', 4)
+    breaker = app_module.CircuitBreaker('test')
+    for _ in range(4):
+        breaker.record(True, 15, app_module.BREAKER_SLOW_CALL_DEEP)
+    assert breaker.state == 'closed'
+    for _ in range(4):
+        breaker.record(True, 15)
+    assert breaker.state == 'open'
+
+
+def test_search_budget_bounds_upstream_calls(app_module, monkeypatch):
+    timeouts = []
+
+    class FakeSession:
+        def get(self, url, params=None, timeout=None):
+            timeouts.append(timeout)
+            raise app_module.requests.ConnectionError('offline')
+
+    monkeypatch.setattr(app_module, 'SERPAPI_KEY', 'test')
+    monkeypatch.setattr(app_module, 'http_session', FakeSession)
+    monkeypatch.setattr(app_module, 'flight_cache', app_module.MemoryFlightCache(100))
+    monkeypatch.setattr(app_module, 'breakers', {'serpapi': app_module.CircuitBreaker('serpapi')})
+    monkeypatch.setattr(app_module, 'FLIGHT_SEARCH_BUDGET', 0)
+
+    result = app_module.run_flight_search(flight_search())
+    assert result['flight_error'] and timeouts == []
+
+    monkeypatch.setattr(app_module, 'FLIGHT_SEARCH_BUDGET', 2)
+    app_module.run_flight_search(flight_search())
+    assert len(timeouts) == 1
+    connect, read = timeouts[0]
+    assert connect <= 2 and read <= 2
+
+
+def test_flight_job_result_is_visible_from_another_worker(app_module, serpapi, tmp_path):
+    job_id = app_module.submit_flight_job(flight_search())
+    other_worker = app_module.FlightJobStore(str(tmp_path / 'flight_jobs.sqlite3'))
+
+    for _ in range(100):
+        result = other_worker.get(job_id)
+        if result:
+            break
+        time.sleep(0.05)
+
+    assert result['flight_results'][0]['flight_number'] == 'AH 1020'
+    assert other_worker.get('inconnu') is None
+
+
+def test_status_poller_makes_one_call_per_batch(app_module, monkeypatch):
+    calls = []
+
+    def fake_call_airlabs(endpoint, params, deadline=None):
+        calls.append((endpoint, params['flight_iata'].split(','), params['offset']))
+        return [{'flight_iata': number, 'status': 'scheduled', 'dep_iata': 'ALG', 'arr_iata': 'CDG'}
+                for number in params['flight_iata'].split(',')], None
+
+    numbers = [f'AH{1000 + i}' for i in range(12)]
+    with open(app_module.FLIGHT_WATCH_FILE, 'w') as f:
+        json.dump({number: time.time() for number in numbers}, f)
+    monkeypatch.setattr(app_module, 'AIRLABS_API_KEY', 'test')
+    monkeypatch.setattr(app_module, 'call_airlabs', fake_call_airlabs)
+    monkeypatch.setattr(app_module, 'FLIGHT_STATUS_BATCH', 5)
+    monkeypatch.setattr(app_module, 'FLIGHT_STATUS_CALL_GAP', 0)
+
+    assert app_module.poll_flight_statuses() == 3
+    assert [len(batch) for _, batch, _ in calls] == [5, 5, 2]
+    assert {endpoint for endpoint, _, _ in calls} == {'schedules'}
+    statuses, _ = app_module.flight_statuses(numbers)
+    assert [entry['status'] for entry in statuses] == ['scheduled'] * 12
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from conftest import BUCKET, s3_keys
+
+
+def add_messages(app, *names):
+    for name in names:
+        app.append_message({'Date': '2026-10-01 10:00:00', 'Nom': name, 'Email': f'{name.lower()}@example.com', 'Telephone': '', 'Message': f'Bonjour de {name}'})
+
+
+def segment_keys(app):
+    return [key for key in s3_keys(app, app.messages_backup_prefix() + '/') if not key.endswith('/manifest.json')]
+
+
+def test_each_append_uploads_its_own_segment(app_module):
+    add_messages(app_module, 'Alice', 'Bruno', 'Chloe')
+
+    keys = segment_keys(app_module)
+    assert len(keys) == 3
+    assert keys[0].endswith('/000000000000.csv')
+    generation, payload = app_module.read_message_backup()
+    assert keys[0] == app_module.message_segment_key(generation, 0)
+    with open(app_module.MESSAGES_FILE, 'rb') as f:
+        assert payload == f.read()
+
+
+def test_missing_segment_is_detected(app_module):
+    add_messages(app_module, 'Alice', 'Bruno', 'Chloe')
+    app_module._s3_client.delete_object(Bucket=BUCKET, Key=segment_keys(app_module)[1])
+
+    with pytest.raises(ValueError, match='segment manquant'):
+        app_module.read_message_backup()
+
+
+def test_restore_messages_rebuilds_journal(app_module):
+    add_messages(app_module, 'Alice', 'Bruno')
+    os.remove(app_module.MESSAGES_FILE)
+
+    result = app_module.app.test_cli_runner().invoke(args=['restore-messages', '--yes'])
+    assert result.exit_code == 0, result.output
+    assert [row['Nom'] for row in app_module.load_messages()] == ['Alice', 'Bruno']
@@ -0,0 +1,19 @@
+from test_message_segments import add_messages
+
+
+def test_page_rereads_journal_replaced_after_refresh(app_module, monkeypatch):
+    add_messages(app_module, 'Alice', 'Bruno', 'Chloe')
+    stale = app_module._refresh_messages()
+    # Compactage par un autre worker : nouveau fichier, positions différentes.
+    app_module.save_messages(app_module.load_messages()[1:])
+    refresh = app_module._refresh_messages
+    calls = []
+
+    def refresh_once_stale():
+        calls.append(1)
+        return stale if len(calls) == 1 else refresh()
+
+    monkeypatch.setattr(app_module, '_refresh_messages', refresh_once_stale)
+    page = app_module.messages_page(1, 10)
+    assert [row['Nom'] for row in page['messages']] == ['Chloe', 'Bruno']
+    assert len(calls) == 2
@@ -0,0 +1,46 @@
+from conftest import s3_keys
+
+
+def snapshot_blobs(app):
+    return [key for key in s3_keys(app, app.snapshot_prefix() + '/') if not key.endswith('/manifest.json')]
+
+
+def test_snapshot_is_created_once_for_unchanged_data(app_module):
+    data = app_module.load_data()
+    app_module.backup_data_snapshot(data)
+    app_module.backup_data_snapshot(data)
+
+    manifest = app_module.read_snapshot_manifest()
+    assert len(manifest['snapshots']) == 1
+    assert snapshot_blobs(app_module) == [manifest['snapshots'][0]['key']]
+
+
+def test_reverted_content_reuses_existing_blob(app_module):
+    original = app_module.load_data()
+    modified = dict(original, company_name='Autre agence')
+    for data in (original, modified, original):
+        app_module.backup_data_snapshot(data)
+
+    entries = app_module.read_snapshot_manifest()['snapshots']
+    assert len(entries) == 3
+    assert entries[0]['sha256'] == entries[2]['sha256'] != entries[1]['sha256']
+    assert len(snapshot_blobs(app_module)) == 2
+
+
+def test_list_and_restore_snapshot(app_module):
+    original = app_module.load_data()
+    app_module.backup_data_snapshot(original)
+    first = app_module.read_snapshot_manifest()['snapshots'][0]
+    with app_module.edit_data() as data:
+        data['company_name'] = 'Nom modifié'
+        app_module.save_data(data)
+    assert app_module.load_data()['company_name'] == 'Nom modifié'
+
+    runner = app_module.app.test_cli_runner()
+    listing = runner.invoke(args=['snapshots', 'list'])
+    assert listing.exit_code == 0, listing.output
+    assert first['sha256'][:12] in listing.output
+
+    result = runner.invoke(args=['snapshots', 'restore', first['sha256'][:12], '--yes'])
+    assert result.exit_code == 0, result.output
+    assert app_module.load_data()['company_name'] == original['company_name']